@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filename: batch.py
+Author: Seth Christie
+
+Batch export of many terms and levels in one run. Each distinct catalog level is
+fetched and parsed once, each distinct Argos CSV is loaded and indexed once, and
+every job is joined and exported from those shared results.
+"""
+import os
+
+import config_functions
+import electives
+from instrumentation import logger
+
+
+# ---------------------------------------------------- functions -------------------------------------------------------
+
+def read_jobs(filename, cfg):
+    """
+    Function to read a batch job spec, either a YAML list of jobs or a mapping with 'jobs'
+    and optional 'url' and 'output' keys
+    :param filename: Path of the job spec
+    :param cfg: Parsed config dictionary providing the defaults
+    :return: Tuple of (list of normalized jobs, url or None, output directory or None)
+    """
+    spec = config_functions.read_config(filename)
+    if isinstance(spec, list):
+        spec = {'jobs': spec}
+
+    if not isinstance(spec, dict) or not spec.get('jobs'):
+        raise ValueError(f'{filename} does not list any jobs')
+
+    return make_jobs(spec['jobs'], cfg), spec.get('url'), spec.get('output')
+
+
+def make_jobs(entries, cfg):
+    """
+    Function to validate job entries and fill in their defaults from the config
+    :param entries: List of dictionaries with term, csv and optional level, filetypes, electives, export_all,
+        schedule (course tags to build conflict-free schedules from), max_schedules, open_only and transcript
+        (YAML file of completed courses, exports the offered courses the student is eligible for)
+    :param cfg: Parsed config dictionary providing the defaults
+    :return: List of jobs with every key present
+    """
+    jobs = []
+    for number, entry in enumerate(entries, start=1):
+        missing = [key for key in ('term', 'csv') if not entry.get(key)]
+        if missing:
+            raise ValueError(f'Job {number} is missing {", ".join(missing)}')
+
+        job = {
+            'term': str(entry['term']).replace(' ', ''),
+            'level': entry.get('level', cfg['defaults']['level']),
+            'csv': entry['csv'],
+            'filetypes': entry.get('filetypes', [cfg['defaults']['filetype']]),
+            'electives': entry.get('electives', []),
+            'export_all': bool(entry.get('export_all', False)),
+            'schedule': entry.get('schedule', []),
+            'max_schedules': entry.get('max_schedules', cfg['schedule']['limit']),
+            'open_only': bool(entry.get('open_only', cfg['schedule']['open_only'])),
+            'transcript': entry.get('transcript'),
+        }
+
+        unknown = [filetype for filetype in job['filetypes'] if filetype not in cfg['app']['filetypes']]
+        unknown += [name for name in job['electives'] if name not in cfg['electives']]
+        if unknown:
+            raise ValueError(f'Job {number} has unknown filetypes or electives: {", ".join(unknown)}')
+
+        jobs.append(job)
+
+    # two jobs writing the same file would silently overwrite each other
+    seen = set()
+    for job in jobs:
+        filenames = [filename for _, _, filename in job_targets(job, '')]
+        extensions = [config_functions.get_extension(filetype) for filetype in job['filetypes']]
+        if job['schedule']:
+            filenames += [f'{job["term"]}_{job["level"]}_schedules.{extension}' for extension in extensions]
+        if job['transcript']:
+            filenames += [f'{job["term"]}_{job["level"]}_eligible.{extension}' for extension in extensions]
+
+        for filename in filenames:
+            if filename in seen:
+                raise ValueError(f'More than one job writes {filename}')
+            seen.add(filename)
+
+    return jobs
+
+
+def job_targets(job, output):
+    """
+    Function to list the export targets of a job
+    :param job: Normalized job from make_jobs
+    :param output: Directory the exports are written into
+    :return: List of (filter, filetype, filename) tuples for export_targets
+    """
+    targets = []
+    for filetype in job['filetypes']:
+        extension = config_functions.get_extension(filetype)
+        targets.append((None, extension, os.path.join(output, f'{job["term"]}_{job["level"]}.{extension}')))
+        targets += [(name, extension, os.path.join(output, f'{job["term"]}_{job["level"]}_{name}.{extension}'))
+                    for name in job['electives']]
+    return targets
+
+
+def export_job_schedules(job, courses, output, cfg, masks=None):
+    """
+    Function to build the conflict-free schedules of a job and export them, one file per filetype
+    :param job: Normalized job from make_jobs with a non-empty 'schedule'
+    :param courses: Dictionary mapping each subject to its Courses, from join_sections
+    :param output: Directory the exports are written into
+    :param cfg: Parsed config dictionary
+    :param masks: Optional bitmasks of sections meeting in more than one row, from schedule.meeting_masks
+    :return: List of written filenames
+    """
+    import schedule
+
+    try:
+        schedules = schedule.find_schedules(courses, job['schedule'], open_only=job['open_only'],
+                                            limit=job['max_schedules'], masks=masks)
+    except KeyError as e:
+        logger.warning(f'No schedules for {job["term"]}: {e.args[0]}', extra={'term': job['term']})
+        return []
+
+    logger.info(f'Found {len(schedules)} schedules for {", ".join(job["schedule"])}', extra={'term': job['term']})
+    if not schedules:
+        return []
+
+    options = config_functions.export_options(cfg)
+    written = []
+    for filetype in job['filetypes']:
+        extension = config_functions.get_extension(filetype)
+        written.append(schedule.export_schedules(
+            schedules, extension, os.path.join(output, f'{job["term"]}_{job["level"]}_schedules.{extension}'),
+            excel_writer=options['excel_writer'], json_backend=options['json_backend'],
+            yaml_backend=options['yaml_backend']))
+    return written
+
+
+def export_job_eligible(job, courses, graph, output, cfg):
+    """
+    Function to export the offered courses a job's transcript makes the student eligible for
+    :param job: Normalized job from make_jobs with a 'transcript'
+    :param courses: Dictionary mapping each subject to its Courses, from join_sections
+    :param graph: PrerequisiteGraph of the job's catalog
+    :param output: Directory the exports are written into
+    :param cfg: Parsed config dictionary
+    :return: List of written filenames
+    """
+    import course_functions
+    import prerequisites
+
+    offered = [tag for subject_courses in courses.values() for tag in subject_courses]
+    eligible = graph.eligible(prerequisites.read_transcript(job['transcript']), offered=offered)
+    logger.info(f'{len(eligible)} of {len(offered)} offered courses are open to {job["transcript"]}',
+                extra={'term': job['term'], 'transcript': job['transcript']})
+
+    options = config_functions.export_options(cfg)
+    extensions = [config_functions.get_extension(filetype) for filetype in job['filetypes']]
+    targets = [(None, extension, os.path.join(output, f'{job["term"]}_{job["level"]}_eligible.{extension}'))
+               for extension in extensions]
+    return course_functions.export_targets(prerequisites.filter_courses(courses, eligible), targets, **options)
+
+
+def run_jobs(cfg, jobs, url, output, cache=None, store=None):
+    """
+    Function to run every job, sharing one catalog parse per level and one section index per CSV. With a
+    store, catalogs and sections are upserted into it and every job is exported from its queries.
+    :param cfg: Parsed config dictionary
+    :param jobs: List of normalized jobs from make_jobs
+    :param url: Base Courses A-Z URL
+    :param output: Directory the exports are written into
+    :param cache: Optional ResponseCache for catalog pages
+    :param store: Optional CourseStore the catalogs and sections are loaded into
+    :return: List of written filenames
+    """
+    # heavy imports are deferred until there is work to do
+    import course_functions
+    import crawler
+    import parse_cache
+
+    rules = electives.compile_rules(cfg['electives'])
+    parsed_cache = parse_cache.from_config(cfg)
+    checkpoint = crawler.from_config(cfg)
+    os.makedirs(output, exist_ok=True)
+
+    # fetch and parse each distinct catalog once, in the order the jobs first need them
+    catalogs = {}
+    for level in dict.fromkeys(job['level'] for job in jobs):
+        logger.info(f'Parsing the {level} catalog', extra={'level': level})
+        pages = course_functions.fetch_catalog(cfg['app']['tags'], config_functions.get_catalog_url(url, level),
+                                               cache=cache, checkpoint=checkpoint,
+                                               **config_functions.network_options(cfg))
+        catalogs[level] = course_functions.parse_catalog(pages, parser=cfg['app']['parser'],
+                                                         parsed_cache=parsed_cache, workers=cfg['parse']['workers'])
+        if store is not None:
+            store.store_catalog(level, catalogs[level])
+
+    # the prerequisite graph of a catalog is only compiled if a job asks for eligibility
+    graphs = {}
+    section_indexes = {}
+    meeting_masks = {}
+    stored_terms = set()
+    written = []
+    for job in jobs:
+        logger.info(f'Exporting {job["term"]} {job["level"]} from {job["csv"]}',
+                    extra={'term': job['term'], 'level': job['level'], 'csv_file': job['csv']})
+
+        if job['csv'] not in section_indexes:
+            df = course_functions.load_sections(job['csv'], tags=cfg['app']['tags'],
+                                                chunksize=cfg['csv']['chunksize'])
+            section_indexes[job['csv']] = course_functions.index_sections(df)
+            # the section index keeps one row per section, schedules need every meeting
+            if any(other['schedule'] for other in jobs if other['csv'] == job['csv']):
+                import schedule
+                meeting_masks[job['csv']] = schedule.meeting_masks(df)
+        if store is not None and (job['term'], job['csv']) not in stored_terms:
+            store.store_sections(job['term'], section_indexes[job['csv']])
+            stored_terms.add((job['term'], job['csv']))
+
+        if store is None:
+            data = course_functions.join_sections(catalogs[job['level']], section_indexes[job['csv']],
+                                                  job['export_all'])
+            subsets = None
+        else:
+            # without a CSV the whole catalog is exported with no sections, as join_sections does
+            term = job['term'] if section_indexes[job['csv']] is not None else None
+            data = store.load_courses(job['level'], term, job['export_all'])
+            subsets = store.get_electives(job['level'], term,
+                                          [rule for rule in rules if rule.name in job['electives']], job['export_all'])
+        written += course_functions.export_targets(data, job_targets(job, output), rules=rules, subsets=subsets,
+                                                   **config_functions.export_options(cfg))
+        if job['schedule']:
+            written += export_job_schedules(job, data, output, cfg, meeting_masks.get(job['csv']))
+        if job['transcript']:
+            if job['level'] not in graphs:
+                import prerequisites
+                graphs[job['level']] = prerequisites.PrerequisiteGraph(catalogs[job['level']])
+            written += export_job_eligible(job, data, graphs[job['level']], output, cfg)
+
+    return written
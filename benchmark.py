@@ -0,0 +1,1064 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filename: benchmark.py
+Author: Seth Christie
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+import config_functions
+import course_functions
+import course_store
+import electives
+import models
+import prerequisites
+import schedule
+import snapshots
+
+CSV_HEADERS = ['SUBJ', 'NUMB', 'SEC', 'CRN', 'TYPE', 'PART', 'CH', 'TITLE', 'INSTRUCTOR', 'M', 'T', 'W', 'TH', 'F',
+               'TIME', 'BLDG', 'ROOM', 'AVAIL', 'ENRL', 'MAX', 'WL_Max', 'WL_Actual', 'CAMPUS']
+SUBJECTS = ['ACCT', 'BIOL', 'BUSN', 'CE', 'CHME', 'CHEM', 'CS', 'ECE', 'EE', 'ENGR', 'IME', 'MATH', 'MECH', 'PHYS']
+TIMES = ['8:00-9:50am', '10:15-12:05pm', '12:45-2:35pm', '3:00-4:50pm', '6:00-8:00pm']
+STANDINGS = ['Freshman', 'Sophomore', 'Junior', 'Senior']
+
+# fixture Courses A-Z pages, laid out as <level>/<tag> like the catalog itself. The committed pages are
+# synthetic: real Winter 2024 course data from exports/ in hand-written catalog-style markup, with placeholder
+# descriptions and credits. '--record URL' replaces them with recordings of the live catalog.
+FIXTURE_DIR = 'data/fixtures'
+
+# real Argos export with sections meeting in more than one row
+SAMPLE_CSV = 'temp/summer24_all.csv'
+
+# size of the 1x suite scale, close to one real term: ~20 courses per tag and the 241 row Argos CSV
+BASE_COURSES_PER_TAG = 20
+BASE_SECTIONS = 250
+
+# modules main imports before the window appears (main itself needs windll, so it is not imported here)
+STARTUP_MODULES = ['tkinter', 'config_functions', 'crawler', 'electives', 'http_cache', 'instrumentation',
+                   'parse_cache']
+
+# every export format timed by the suite, as (filetype, excel_writer)
+SUITE_EXPORTS = [('xlsx', 'stream'), ('xlsx', 'styleframe'), ('json', 'stream'), ('ndjson', 'stream'),
+                 ('yml', 'stream'), ('arrow', 'stream'), ('parquet', 'stream')]
+
+
+# ---------------------------------------------------- functions -------------------------------------------------------
+
+def synthetic_sections(n_sections, sections_per_course=10, seed=0):
+    """
+    Function to generate a synthetic Argos class schedule
+    :param n_sections: Number of section rows to generate
+    :param sections_per_course: Average number of sections per course
+    :param seed: Random seed so runs are repeatable
+    :return: List of rows in Argos column order
+    """
+    rng = random.Random(seed)
+    n_courses = max(1, n_sections // sections_per_course)
+    courses = [(SUBJECTS[i % len(SUBJECTS)], str(100 + i // len(SUBJECTS))) for i in range(n_courses)]
+
+    rows = []
+    for crn in range(n_sections):
+        subj, numb = courses[crn % n_courses]
+        days = [day if rng.random() < 0.4 else ' ' for day in ('M', 'T', 'W', 'R', 'F')]
+        # lab sections and unassigned rooms keep SEC and ROOM as text, as in the real Argos export
+        suffix = 'L' if rng.random() < 0.1 else ''
+        room = rng.randint(1000, 4999) if rng.random() < 0.95 else 'TBA'
+        rows.append([subj, numb, f'{crn // n_courses + 1:02d}{suffix}', 30000 + crn, 'LEC', 1, 4, f'{subj} {numb}',
+                     f'Instructor {rng.randint(1, 500)}', *days, rng.choice(TIMES), 'AB', room, rng.randint(0, 40),
+                     rng.randint(0, 40), 40, 0, 0, 'Main Campus'])
+    return rows
+
+
+def write_synthetic_csv(n_sections, directory):
+    """
+    Function to write a synthetic Argos CSV to disk
+    :param n_sections: Number of section rows to generate
+    :param directory: Directory to write the CSV into
+    :return: Path of the written CSV
+    """
+    path = os.path.join(directory, f'synthetic_{n_sections}.csv')
+    pd.DataFrame(synthetic_sections(n_sections), columns=CSV_HEADERS).to_csv(path, index=False)
+    return path
+
+
+def synthetic_courseblock(subj, numb, rng):
+    """
+    Function to generate the HTML of a single Courses A-Z courseblock
+    :param subj: Course subject
+    :param numb: Course number
+    :param rng: Random number generator
+    :return: HTML string of the courseblock
+    """
+    lines = []
+    if rng.random() < 0.6:
+        lines.append(f'Prerequisites: <a href="/search/?P={subj}%20{int(numb) - 1}">{subj}-{int(numb) - 1}</a> '
+                     f'(Minimum grade: C) and <a href="/search/?P=MATH%20101">MATH-101</a>')
+    if rng.random() < 0.2:
+        lines.append(f'Corequisites: <a href="/search/?P={subj}%20{numb}L">{subj}-{numb}L</a>')
+    lines.append(f'An introduction to {subj} topics &amp; methods, part {numb}.\n'
+                 f'Emphasis on <em>analysis</em> and  design.')
+    lines.append(f'Minimum Class Standing: {rng.choice(STANDINGS)}')
+    desc = '<br/>\n'.join(lines)
+
+    return (f'<div class="courseblock">\n'
+            f'<p class="courseblocktitle"><strong>{subj}-{numb}&#160;&#160;{subj} Topics {numb}&#160;&#160;'
+            f'{rng.randint(1, 4)} Credits</strong></p>\n'
+            f'<p class="courseblockdesc">\n{desc}<br/>\n</p>\n'
+            f'</div>\n')
+
+
+def synthetic_catalog_page(subj, n_courses, seed=0):
+    """
+    Function to generate a synthetic Courses A-Z page for one subject
+    :param subj: Course subject
+    :param n_courses: Number of courseblocks on the page
+    :param seed: Random seed so runs are repeatable
+    :return: HTML string of the page
+    """
+    rng = random.Random(seed)
+    blocks = ''.join(synthetic_courseblock(subj, str(100 + i), rng) for i in range(n_courses))
+    return (f'<!doctype html>\n<html><head><title>{subj} Courses</title></head><body>\n'
+            f'<div id="content"><div class="sc_sccoursedescs">\n{blocks}</div></div>\n</body></html>')
+
+
+def synthetic_course_list(n_courses, sections_per_course=3, seed=0):
+    """
+    Function to generate a synthetic joined course dictionary, as returned by get_course_data
+    :param n_courses: Number of courses to generate
+    :param sections_per_course: Number of sections per course
+    :param seed: Random seed so runs are repeatable
+    :return: Dictionary of courses keyed by subject then course tag
+    """
+    rng = random.Random(seed)
+    course_list = {subj: {} for subj in SUBJECTS}
+
+    for i in range(n_courses):
+        subj = SUBJECTS[i % len(SUBJECTS)]
+        tag = f'{subj}-{100 + i // len(SUBJECTS)}'
+        sections = {f'{sec:02d}': {
+            'instructor': f'Instructor {rng.randint(1, 500)}',
+            'time': rng.choice(TIMES),
+            'date': ', '.join(day for day in ('M', 'T', 'W', 'R', 'F') if rng.random() < 0.4),
+            'building': 'AB',
+            'room': str(rng.randint(1000, 4999)),
+            'avail': rng.randint(0, 40),
+        } for sec in range(1, sections_per_course + 1)}
+
+        course_list[subj][tag] = {
+            'tag': tag,
+            'name': f'{subj} Topics {i}',
+            'coreqs': 'None',
+            'prereqs': f'{subj}-{99 + i // len(SUBJECTS)} (Minimum grade: C)',
+            'standing': rng.choice(STANDINGS),
+            'desc': f'An introduction to {subj} topics and methods, part {i}.',
+            'credits': str(rng.randint(1, 4)),
+            'sections': sections,
+        }
+    return course_list
+
+
+def record_fixtures(tags, catalog_url, level, directory=FIXTURE_DIR):
+    """
+    Function to record the live Courses A-Z pages so the suite can replay them offline
+    :param tags: List of course tags to record
+    :param catalog_url: Base Courses A-Z URL
+    :param level: Course level, 'Undergrad' or 'Grad'
+    :param directory: Fixture directory the pages are written into
+    :return: Number of pages recorded
+    """
+    pages = course_functions.fetch_catalog(tags, config_functions.get_catalog_url(catalog_url, level))
+    os.makedirs(os.path.join(directory, level.lower()), exist_ok=True)
+
+    for tag, html_text in pages.items():
+        with open(os.path.join(directory, level.lower(), tag.lower()), 'w', encoding='utf-8') as file:
+            file.write(html_text)
+    return len(pages)
+
+
+def fixture_pages(directory=FIXTURE_DIR):
+    """
+    Function to read every fixture Courses A-Z page
+    :param directory: Fixture directory holding synthetic or recorded pages
+    :return: Dictionary mapping each URL path '/<level>/<tag>' to its HTML, in path order
+    """
+    pages = {}
+    if not os.path.isdir(directory):
+        return pages
+
+    for level in sorted(os.listdir(directory)):
+        for tag in sorted(os.listdir(os.path.join(directory, level))):
+            with open(os.path.join(directory, level, tag), 'r', encoding='utf-8') as file:
+                pages[f'/{level}/{tag}'] = file.read()
+    return pages
+
+
+def catalog_pages(tags, scale, level='Undergrad', directory=FIXTURE_DIR):
+    """
+    Function to build the pages served by CatalogServer. Fixture pages are replayed at 1x,
+    every other page is generated so each scale has the same shape.
+    :param tags: List of course tags
+    :param scale: Scale factor, 1 for a real sized catalog
+    :param level: Course level, 'Undergrad' or 'Grad'
+    :param directory: Fixture directory holding synthetic or recorded pages
+    :return: Dictionary mapping each URL path to its HTML
+    """
+    pages = {}
+    for tag in tags:
+        path = f'/{level.lower()}/{tag.lower()}'
+        fixture = os.path.join(directory, level.lower(), tag.lower())
+
+        if scale == 1 and os.path.isfile(fixture):
+            with open(fixture, 'r', encoding='utf-8') as file:
+                pages[path] = file.read()
+        else:
+            pages[path] = synthetic_catalog_page(tag, BASE_COURSES_PER_TAG * scale)
+    return pages
+
+
+def parse_page(html_text, parser):
+    """
+    Function to parse every courseblock of a page into course dictionaries
+    :param html_text: HTML of the catalog page
+    :param parser: Parser engine, 'fast' or 'bs4'
+    :return: List of course dictionaries
+    """
+    return [course_functions.parse_courseblock(title.split('\xa0'), lines, texts)
+            for title, lines, texts in course_functions.get_courseblocks(html_text, parser)]
+
+
+class CatalogServer:
+    """
+    Local stand-in for catalog.kettering.edu serving a fixed set of pages on a free port,
+    so the pipeline can be benchmarked end to end without the network. Faults can be queued
+    per path as (status, Retry-After or None) and are answered before the page is served.
+    """
+
+    def __init__(self, pages, faults=None):
+        self.pages = {path: html_text.encode('utf-8') for path, html_text in pages.items()}
+        self.faults = {path: list(statuses) for path, statuses in (faults or {}).items()}
+        self.requests = []
+        pages_by_path, faults_by_path, requests_seen = self.pages, self.faults, self.requests
+        lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.rstrip('/')
+                with lock:
+                    requests_seen.append((path, time.monotonic()))
+                    fault = faults_by_path[path].pop(0) if faults_by_path.get(path) else None
+
+                if fault is not None:
+                    status, retry_after = fault
+                    self.send_response(status)
+                    if retry_after is not None:
+                        self.send_header('Retry-After', str(retry_after))
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                body = pages_by_path.get(path)
+                self.send_response(200 if body is not None else 404)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body or b'')))
+                self.end_headers()
+                self.wfile.write(body or b'')
+
+            def log_message(self, *args):
+                pass
+
+        # the default listen backlog of 5 drops connections from a full fetch pool, costing a 1s SYN retry
+        server_class = type('Server', (ThreadingHTTPServer,), {'request_queue_size': 64})
+        self.server = server_class(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def timed(func, *args, **kwargs):
+    """
+    Function to time a single call
+    :param func: Function to be timed
+    :return: Tuple of (seconds elapsed, return value)
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def profiled(func, *args, **kwargs):
+    """
+    Function to time a single call and record its peak traced memory
+    :param func: Function to be profiled
+    :return: Tuple of (seconds elapsed, peak bytes allocated)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def traced_size(func, *args, **kwargs):
+    """
+    Function to measure the memory still held by the result of a call
+    :param func: Function building the object to be measured
+    :return: Tuple of (bytes allocated, return value)
+    """
+    tracemalloc.start()
+    result = func(*args, **kwargs)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, result
+
+
+def measure(func, repeat=3):
+    """
+    Function to time repeated calls, asv style
+    :param func: Callable to be timed
+    :param repeat: Number of calls
+    :return: Dictionary of the min and median seconds
+    """
+    samples = [timed(func)[0] for _ in range(repeat)]
+    return {'min': min(samples), 'median': statistics.median(samples)}
+
+
+def import_times(modules):
+    """
+    Function to measure a cold import of some modules in a fresh interpreter with -X importtime
+    :param modules: List of module names imported together
+    :return: Tuple of (total microseconds, list of (cumulative microseconds, module) for top-level imports)
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {", ".join(modules)}'],
+                            capture_output=True, text=True, check=True)
+
+    total = 0
+    top_level = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        total += int(own)
+        # nested imports are indented below the module that imported them
+        if not name[1:].startswith(' '):
+            top_level.append((int(cumulative), name.strip()))
+    return total, sorted(top_level, reverse=True)
+
+
+def legacy_lookup(df, course_id):
+    """
+    Function reproducing the original per-course scan used before the section index
+    :param df: Dataframe containing sections
+    :param course_id: Course tag 'MATH-204', 'ECON-201', etc.
+    :return: List of matching section records
+    """
+    courseids = [f'{subject}-{number}' for subject, number in zip(df['SUBJ'].values, df['NUMB'].values)]
+    if course_id not in courseids:
+        return []
+    subj, numb = course_id.split('-')
+    return df[(df['SUBJ'] == subj) & (df['NUMB'].astype(str) == numb)].copy().to_dict(orient='records')
+
+
+def legacy_load_sections(csv_file):
+    """
+    Function reproducing the original loader, reading every column with inferred dtypes
+    :param csv_file: Specified csv file from Argos
+    :return: Dataframe containing sections
+    """
+    df = pd.read_csv(csv_file)
+    return df.drop(columns=['TYPE', 'PART', 'MAX', 'WL_Max', 'WL_Actual', 'CAMPUS'])
+
+
+def bench_index(sizes, lookups=25):
+    """
+    Function to compare the legacy course scan against the prebuilt section index
+    :param sizes: List of section counts to benchmark
+    :param lookups: Number of course lookups timed for the legacy scan
+    :return: None
+    """
+    print(f'{"sections":>10} {"legacy/course":>15} {"build index":>13} {"index/course":>14} {"speedup":>10}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            df = pd.read_csv(write_synthetic_csv(size, directory))
+            course_ids = sorted({f'{subj}-{numb}' for subj, numb in zip(df['SUBJ'], df['NUMB'])})
+            sample = random.Random(0).sample(course_ids, min(lookups, len(course_ids)))
+
+            legacy, _ = timed(lambda: [legacy_lookup(df, course_id) for course_id in sample])
+            legacy /= len(sample)
+
+            build, index = timed(course_functions.index_sections, df)
+            indexed, _ = timed(lambda: [course_functions.get_sections(index, [course_id])
+                                        for course_id in course_ids])
+            indexed /= len(course_ids)
+
+            print(f'{size:>10} {legacy * 1e3:>13.3f}ms {build * 1e3:>11.1f}ms {indexed * 1e6:>12.2f}us '
+                  f'{legacy / indexed:>9.0f}x')
+
+
+def bench_parser(sizes):
+    """
+    Function to compare the BeautifulSoup and single-pass courseblock parsers and check they agree
+    :param sizes: List of courseblock counts per page to benchmark
+    :return: None
+    """
+    print(f'{"courses":>16} {"bs4":>12} {"fast":>12} {"speedup":>10} {"parity":>8}')
+
+    for size in sizes:
+        page = synthetic_catalog_page('MECH', size)
+        slow, slow_courses = timed(parse_page, page, 'bs4')
+        fast, fast_courses = timed(parse_page, page, 'fast')
+        parity = slow_courses == fast_courses
+
+        print(f'{size:>16} {slow * 1e3:>10.1f}ms {fast * 1e3:>10.1f}ms {slow / fast:>9.1f}x {str(parity):>8}')
+        if not parity:
+            raise AssertionError(f'parser engines disagree on a {size} course page')
+
+    # fixture pages carry real course data, prerequisite expressions and catalog-style markup
+    for path, page in fixture_pages().items():
+        slow, slow_courses = timed(parse_page, page, 'bs4')
+        fast, fast_courses = timed(parse_page, page, 'fast')
+        parity = slow_courses == fast_courses and len(fast_courses) > 0
+
+        print(f'{path:>16} {slow * 1e3:>10.1f}ms {fast * 1e3:>10.1f}ms {slow / fast:>9.1f}x {str(parity):>8}')
+        if not parity:
+            raise AssertionError(f'parser engines disagree on the fixture page {path}')
+
+
+def bench_parse_pool(sizes, workers=(2, 4), config_file='data/config.yml'):
+    """
+    Function to compare serial catalog parsing against the process-pool parse stage
+    :param sizes: List of courses per tag to benchmark, over every configured tag
+    :param workers: Worker counts to compare against the serial path
+    :param config_file: Path of the config file providing the tags
+    :return: None
+    """
+    tags = config_functions.read_config(config_file)['app']['tags']
+    print(f'{"courses":>10} {"workers":>8} {"time":>9} {"speedup":>8}')
+
+    for size in sizes:
+        pages = {tag: synthetic_catalog_page(tag, size) for tag in tags}
+        serial, expected = timed(course_functions.parse_catalog, pages)
+        print(f'{size * len(tags):>10} {1:>8} {serial:>8.2f}s {1:>7.1f}x')
+
+        for count in workers:
+            elapsed, catalog = timed(course_functions.parse_catalog, pages, workers=count)
+            if catalog != expected or list(catalog) != list(expected):
+                raise AssertionError(f'parsing with {count} workers changed the catalog')
+            print(f'{size * len(tags):>10} {count:>8} {elapsed:>8.2f}s {serial / elapsed:>7.1f}x')
+
+
+def bench_excel(sizes):
+    """
+    Function to compare the StyleFrame and streaming Excel writers
+    :param sizes: List of course counts to benchmark
+    :return: None
+    """
+    print(f'{"courses":>10} {"writer":>12} {"time":>10} {"peak memory":>13}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            courses = models.from_course_dict(synthetic_course_list(size))
+            for writer in ('styleframe', 'stream'):
+                path = os.path.join(directory, f'{writer}_{size}.xlsx')
+                elapsed, peak = profiled(course_functions.export_courses, courses, 'xlsx', path,
+                                         excel_writer=writer)
+                print(f'{size:>10} {writer:>12} {elapsed:>9.2f}s {peak / 2 ** 20:>11.1f}MB')
+
+
+def bench_memory(sizes):
+    """
+    Function to compare the memory held by nested course dictionaries and slotted Course/Section objects
+    :param sizes: List of course counts to benchmark
+    :return: None
+    """
+    print(f'{"courses":>10} {"dicts":>10} {"models":>10} {"saving":>8}')
+
+    for size in sizes:
+        course_list = synthetic_course_list(size)
+
+        # both shapes share the same leaf strings, so only the containers are measured
+        dicts, _ = traced_size(lambda: {subject: {tag: {**course, 'sections': {
+            section: dict(block) for section, block in course['sections'].items()}}
+            for tag, course in courses.items()} for subject, courses in course_list.items()})
+        slotted, catalog = traced_size(models.from_course_dict, course_list)
+
+        if models.to_course_dict(catalog) != course_list:
+            raise AssertionError('Course/Section conversion is not lossless')
+
+        print(f'{size:>10} {dicts / 2 ** 20:>8.1f}MB {slotted / 2 ** 20:>8.1f}MB {1 - slotted / dicts:>7.0%}')
+
+
+def bench_fanout(sizes, config_file='data/config.yml'):
+    """
+    Function to compare serial exports against the export_targets fan-out
+    :param sizes: List of course counts to benchmark
+    :param config_file: Path of the config file providing the elective rules
+    :return: None
+    """
+    rules = electives.compile_rules(config_functions.read_config(config_file)['electives'])
+    print(f'{"courses":>10} {"targets":>8} {"serial":>10} {"thread":>10} {"process":>10}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            courses = models.from_course_dict(synthetic_course_list(size))
+            targets = [(name, filetype, os.path.join(directory, f'{name}.{filetype}'))
+                       for name in [None] + [rule.name for rule in rules] for filetype in ('xlsx', 'json', 'yml')]
+
+            def serial():
+                subsets = electives.get_electives(courses, rules)
+                for name, filetype, filename in targets:
+                    course_functions.export_courses(courses if name is None else subsets[name], filetype, filename,
+                                                    excel_writer='stream')
+
+            results = [timed(serial)[0]]
+            for executor in ('thread', 'process'):
+                results.append(timed(course_functions.export_targets, courses, targets, rules=rules,
+                                     excel_writer='stream', executor=executor)[0])
+
+            print(f'{size:>10} {len(targets):>8} ' + ' '.join(f'{result:>9.2f}s' for result in results))
+
+
+def bench_serialize(sizes):
+    """
+    Function to report the throughput of every JSON/NDJSON/YAML serializer backend
+    :param sizes: List of course counts to benchmark
+    :return: None
+    """
+    backends = [('json', course_functions.dump_json, 'json'), ('json', course_functions.dump_json, 'orjson'),
+                ('ndjson', course_functions.dump_ndjson, 'json'), ('ndjson', course_functions.dump_ndjson, 'orjson'),
+                ('yml', course_functions.dump_yaml, 'python'), ('yml', course_functions.dump_yaml, 'libyaml')]
+    print(f'{"courses":>10} {"format":>8} {"backend":>8} {"time":>10} {"size":>10} {"throughput":>12}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            course_dict = models.to_course_dict(models.from_course_dict(synthetic_course_list(size)))
+            for extension, dump, backend in backends:
+                path = os.path.join(directory, f'{backend}.{extension}')
+                elapsed, _ = timed(dump, course_dict, path, backend)
+                megabytes = os.path.getsize(path) / 2 ** 20
+                print(f'{size:>10} {extension:>8} {backend:>8} {elapsed:>9.3f}s {megabytes:>8.1f}MB '
+                      f'{megabytes / elapsed:>8.1f}MB/s')
+
+
+def bench_columnar(sizes):
+    """
+    Function to compare reloading an Excel export against the Arrow and Parquet exports
+    :param sizes: List of course counts to benchmark
+    :return: None
+    """
+    print(f'{"courses":>10} {"format":>8} {"write":>10} {"reload":>10} {"size":>10}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            courses = models.from_course_dict(synthetic_course_list(size))
+            for filetype, load in (('xlsx', pd.read_excel), ('parquet', course_functions.load_columnar),
+                                   ('arrow', course_functions.load_columnar)):
+                path = os.path.join(directory, f'catalog.{filetype}')
+                write, _ = timed(course_functions.export_courses, courses, filetype, path, excel_writer='stream')
+                reload, _ = timed(load, path)
+                print(f'{size:>10} {filetype:>8} {write:>9.3f}s {reload:>9.3f}s '
+                      f'{os.path.getsize(path) / 2 ** 20:>8.1f}MB')
+
+
+def bench_csv(sizes, chunksize=50000):
+    """
+    Function to compare the legacy CSV loader against the dtype-aware, chunked loader
+    :param sizes: List of section counts to benchmark
+    :param chunksize: Number of rows read at a time by the chunked loader
+    :return: None
+    """
+    print(f'{"sections":>10} {"loader":>8} {"time":>9} {"peak":>9} {"frame":>9}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            path = write_synthetic_csv(size, directory)
+            loaders = (('legacy', legacy_load_sections),
+                       ('dtyped', course_functions.load_sections),
+                       ('chunked', lambda csv_file: course_functions.load_sections(csv_file, tags=SUBJECTS,
+                                                                                   chunksize=chunksize)))
+
+            expected = None
+            for name, load in loaders:
+                elapsed, peak = profiled(load, path)
+                df = load(path)
+                frame = df.memory_usage(deep=True).sum()
+
+                index = course_functions.index_sections(df)
+                if expected is None:
+                    expected = index
+                elif index != expected:
+                    raise AssertionError(f'{name} loader changed the section index')
+
+                print(f'{size:>10} {name:>8} {elapsed:>8.2f}s {peak / 2 ** 20:>7.1f}MB {frame / 2 ** 20:>7.1f}MB')
+
+
+def bench_suite(sizes, repeat=3, save=None, compare=None, threshold=0.2, config_file='data/config.yml'):
+    """
+    Function to run the release benchmark suite fully offline: get_course_data against a local
+    catalog server, the elective filters and every export format, at each scale factor
+    :param sizes: List of scale factors, 1 is a real sized term
+    :param repeat: Number of timed calls per benchmark
+    :param save: Optional JSON file to write the results into
+    :param compare: Optional JSON file of earlier results to check for regressions
+    :param threshold: Fractional slowdown of the median reported as a regression
+    :param config_file: Path of the config file providing the tags and elective rules
+    :return: Number of regressions found
+    """
+    cfg = config_functions.read_config(config_file)
+    tags = cfg['app']['tags']
+    rules = electives.compile_rules(cfg['electives'])
+    results = {}
+    # the stand-in server is local, so the crawl rate limit would only time its own sleeps
+    network = {**config_functions.network_options(cfg), 'rate': 0}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in sizes:
+            csv_file = write_synthetic_csv(BASE_SECTIONS * scale, directory)
+
+            with CatalogServer(catalog_pages(tags, scale)) as server:
+                catalog_url = config_functions.get_catalog_url(server.url, 'Undergrad')
+                results[f'{scale}x get_course_data'] = measure(
+                    lambda: course_functions.get_course_data(csv_file, tags, catalog_url, False, **network), repeat)
+                # the filters and exports get the whole catalog, not only the courses with sections
+                courses = course_functions.get_course_data(csv_file, tags, catalog_url, True, **network)
+
+            results[f'{scale}x get_electives'] = measure(lambda: electives.get_electives(courses, rules), repeat)
+
+            for filetype, excel_writer in SUITE_EXPORTS:
+                path = os.path.join(directory, f'export.{filetype}')
+                name = f'{scale}x export {filetype}' + (f' ({excel_writer})' if filetype == 'xlsx' else '')
+                results[name] = measure(
+                    lambda: course_functions.export_courses(courses, filetype, path, excel_writer=excel_writer), repeat)
+
+    baseline = {}
+    if compare is not None:
+        with open(compare, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+
+    regressions = 0
+    print(f'{"benchmark":<34} {"min":>10} {"median":>10} {"baseline":>10} {"change":>8}')
+    for name, result in results.items():
+        line = f'{name:<34} {result["min"]:>9.4f}s {result["median"]:>9.4f}s'
+        if name in baseline:
+            change = result['median'] / baseline[name]['median'] - 1
+            line += f' {baseline[name]["median"]:>9.4f}s {change:>+7.0%}'
+            if change > threshold:
+                line += '  REGRESSION'
+                regressions += 1
+        print(line)
+
+    if save is not None:
+        with open(save, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+    return regressions
+
+
+def bench_startup(sizes, top=5):
+    """
+    Function to compare the GUI startup imports before (interfaces importing course_functions)
+    and after (course_functions loaded lazily by the pipeline)
+    :param sizes: Number of cold interpreter runs, the fastest is reported
+    :param top: Number of heaviest top-level imports listed
+    :return: None
+    """
+    for name, modules in (('eager', STARTUP_MODULES + ['course_functions']), ('lazy', STARTUP_MODULES)):
+        runs = [import_times(modules) for _ in range(max(sizes))]
+        total, heaviest = min(runs)
+        print(f'{name}: {total / 1e3:.1f}ms to import {len(modules)} modules')
+        for cumulative, module in heaviest[:top]:
+            print(f'    {cumulative / 1e3:>8.1f}ms  {module}')
+
+
+def bench_schedule(sizes, n_courses=5, limit=100, brute_limit=200000):
+    """
+    Function to compare the pruned schedule search against checking every combination of sections
+    :param sizes: List of sections per course to benchmark
+    :param n_courses: Number of courses scheduled together
+    :param limit: Maximum number of schedules built, as in the 'schedule' config
+    :param brute_limit: Largest number of combinations the brute force is run for
+    :return: None
+    """
+    print(f'{"sections":>10} {"combinations":>14} {"valid":>12} {"brute":>10} {"count":>10} {"find":>10}')
+
+    for size in sizes:
+        rng = random.Random(size)
+        days = ['M, W, F', 'T, R', 'M, W', 'T', 'F', 'M, R']
+        courses = {'SYN': {}}
+        for number in range(n_courses):
+            sections = tuple(models.Section(f'{index:02d}', 'STAFF', rng.choice(TIMES), rng.choice(days), 'AB',
+                                            '1000', 40) for index in range(size))
+            tag = f'SYN-{100 + number}'
+            courses['SYN'][tag] = models.Course(tag, tag, 'None', 'None', 'None', '', '4', sections)
+        wanted = list(courses['SYN'])
+
+        counted, valid = timed(schedule.count_schedules, courses, wanted)
+        found, schedules = timed(schedule.find_schedules, courses, wanted, limit=limit)
+        if len(schedules) != min(valid, limit):
+            raise AssertionError('find_schedules and count_schedules disagree')
+
+        brute = '-'
+        combinations = size ** n_courses
+        if combinations <= brute_limit:
+            def brute_force():
+                masks = [[schedule.section_mask(section) for section in course.sections]
+                         for course in courses['SYN'].values()]
+                count = 0
+                for combo in itertools.product(*masks):
+                    used = 0
+                    for mask in combo:
+                        if mask & used:
+                            break
+                        used |= mask
+                    else:
+                        count += 1
+                return count
+
+            elapsed, count = timed(brute_force)
+            if count != valid:
+                raise AssertionError('schedule search and brute force disagree')
+            brute = f'{elapsed:.4f}s'
+
+        print(f'{size:>10} {combinations:>14} {valid:>12} {brute:>10} {counted:>9.4f}s {found:>9.4f}s')
+
+    # CS-100 01 meets T/F 10:15-11:45 and W 10:15-12:20 on two rows, BUSN-303 01 meets T/F 10:15-12:20
+    df = course_functions.load_sections(SAMPLE_CSV)
+    if df is not None:
+        index = course_functions.index_sections(df)
+        courses = {}
+        for tag in ('CS-100', 'BUSN-303'):
+            sections = tuple(section for section in index[tag] if section.section == '01')
+            courses.setdefault(tag.partition('-')[0], {})[tag] = models.Course(tag, tag, 'None', 'None', 'None', '',
+                                                                                '4', sections)
+        if schedule.find_schedules(courses, ['CS-100', 'BUSN-303'], masks=schedule.meeting_masks(df)):
+            raise AssertionError('CS-100 01 and BUSN-303 01 were scheduled together despite clashing')
+
+
+def bench_prereqs(sizes, queries=20):
+    """
+    Function to compare eligibility queries on the compiled prerequisite graph against evaluating
+    each course's requirement text per query
+    :param sizes: List of catalog sizes (courses) to benchmark
+    :param queries: Number of random transcripts checked per size
+    :return: None
+    """
+    print(f'{"courses":>10} {"clauses":>10} {"build":>10} {"text":>10} {"graph":>10}')
+
+    def holds(requirement, transcript):
+        if requirement is None:
+            return True
+        if requirement[0] == 'course':
+            return requirement[1] in transcript and prerequisites.meets_grade(transcript[requirement[1]],
+                                                                              requirement[2])
+        test = all if requirement[0] == 'and' else any
+        return test(holds(child, transcript) for child in requirement[1])
+
+    for size in sizes:
+        rng = random.Random(size)
+        tags = [f'SYN-{100 + number}' for number in range(size)]
+        catalog = {'SYN': {}}
+        for index, tag in enumerate(tags):
+            earlier = tags[:index]
+            prereqs = 'None'
+            if earlier and rng.random() < 0.7:
+                picks = [f'{choice} (Minimum grade: {rng.choice("ABCD")})' if rng.random() < 0.3 else choice
+                         for choice in rng.sample(earlier, min(len(earlier), rng.randint(1, 4)))]
+                prereqs = picks[0] if len(picks) == 1 else f'({picks[0]} or {picks[1]})' + ''.join(
+                    f' and {pick}' for pick in picks[2:])
+            catalog['SYN'][tag] = {'prereqs': prereqs, 'coreqs': 'None'}
+        transcripts = [{tag: rng.choice(list(prerequisites.GRADE_POINTS)) for tag in rng.sample(tags, size // 4)}
+                       for _ in range(queries)]
+
+        def text_queries():
+            return [sorted(tag for tag, course in catalog['SYN'].items()
+                           if tag not in transcript and holds(prerequisites.parse_requirement(course['prereqs']),
+                                                              transcript))
+                    for transcript in transcripts]
+
+        # the text baseline never drops failed courses, so compare on transcripts of passed grades only
+        for transcript in transcripts:
+            for tag, grade in transcript.items():
+                if not prerequisites.meets_grade(grade, None):
+                    transcript[tag] = 'C'
+
+        built, graph = timed(prerequisites.PrerequisiteGraph, catalog)
+        text, expected = timed(text_queries)
+        compiled, results = timed(lambda: [graph.eligible(transcript) for transcript in transcripts])
+        if results != expected:
+            raise AssertionError('compiled and text eligibility disagree')
+
+        print(f'{size:>10} {len(graph.prereq_clauses.matrix):>10} {built:>9.4f}s {text:>9.4f}s {compiled:>9.4f}s')
+
+    # a lecture and its lab list each other as corequisites, both are open to a new student
+    pair = {'BIOL': {'BIOL-141': {'prereqs': 'None', 'coreqs': 'BIOL-142'},
+                     'BIOL-142': {'prereqs': 'None', 'coreqs': 'BIOL-141'},
+                     'BIOL-241': {'prereqs': 'BIOL-141', 'coreqs': 'BIOL-242'},
+                     'BIOL-242': {'prereqs': 'BIOL-141', 'coreqs': 'BIOL-241'}}}
+    if prerequisites.PrerequisiteGraph(pair).eligible({}) != ['BIOL-141', 'BIOL-142']:
+        raise AssertionError('a corequisite pair is not eligible together')
+
+
+def bench_store(sizes, sections_per_course=5, queries=20):
+    """
+    Function to time loading the SQLite store row by row against one executemany transaction, reloading
+    unchanged data, and indexed section queries against scanning the nested course dictionary
+    :param sizes: List of course counts to benchmark
+    :param sections_per_course: Number of sections per course
+    :param queries: Number of instructor queries timed
+    :return: None
+    """
+    print(f'{"sections":>10} {"per row":>10} {"bulk":>10} {"reload":>10} {"scan/query":>12} {"sql/query":>11}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            courses = models.from_course_dict(synthetic_course_list(size, sections_per_course))
+            n_sections = size * sections_per_course
+            instructors = [f'Instructor {number}' for number in random.Random(size).sample(range(1, 501), queries)]
+
+            # baseline of one statement and one commit per section
+            store = course_store.CourseStore(os.path.join(directory, f'rows_{size}.db'))
+            statement = course_store.upsert('sections', ('term', 'tag', 'section'),
+                                            ('position',) + course_store.SECTION_COLUMNS)
+
+            def per_row():
+                for subject_courses in courses.values():
+                    for tag, course in subject_courses.items():
+                        for position, section in enumerate(course.sections):
+                            minutes = schedule.parse_time(section.time) or (None, None)
+                            store.connection.execute(statement, ('BENCH', tag, section.section, position,
+                                                                 section.instructor, section.time, section.date,
+                                                                 section.building, section.room, section.avail)
+                                                     + minutes)
+                            store.connection.commit()
+
+            rows, _ = timed(per_row)
+            store.close()
+
+            store = course_store.CourseStore(os.path.join(directory, f'bulk_{size}.db'))
+            store.store_catalog('Undergrad', courses)
+            bulk, _ = timed(store.store_sections, 'BENCH', courses)
+            reload, _ = timed(store.store_sections, 'BENCH', courses)
+
+            def scan():
+                return [[(tag, section) for subject_courses in courses.values()
+                         for tag, course in subject_courses.items() for section in course.sections
+                         if section.instructor == instructor and section.avail > 0] for instructor in instructors]
+
+            scanned, expected = timed(scan)
+            queried, found = timed(lambda: [store.find_sections('BENCH', instructor=instructor, open_only=True)
+                                            for instructor in instructors])
+            store.close()
+            if [sorted(map(repr, result)) for result in found] != [sorted(map(repr, result)) for result in expected]:
+                raise AssertionError('store queries and the dictionary scan disagree')
+
+            print(f'{n_sections:>10} {rows:>9.4f}s {bulk:>9.4f}s {reload:>9.4f}s {scanned / queries * 1e3:>10.3f}ms '
+                  f'{queried / queries * 1e3:>9.3f}ms')
+
+
+def bench_snapshots(sizes, n_sections=2000, changed=0.02):
+    """
+    Function to compare streaming hashed snapshot deltas against loading every snapshot and comparing
+    every field of every row
+    :param sizes: List of snapshot counts to benchmark
+    :param n_sections: Number of sections per snapshot
+    :param changed: Fraction of sections whose seats change between snapshots
+    :return: None
+    """
+    print(f'{"snapshots":>10} {"deltas":>8} {"load all":>10} {"peak":>10} {"stream":>10} {"peak":>10}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            rng = random.Random(size)
+            rows = synthetic_sections(n_sections)
+            files = []
+            for number in range(size):
+                for row in rng.sample(rows, int(n_sections * changed)):
+                    row[17] = max(0, row[17] + rng.choice([-3, -1, 1, 3]))
+                files.append(os.path.join(directory, f'snapshot_{number:05d}.csv'))
+                pd.DataFrame(rows, columns=CSV_HEADERS).to_csv(files[-1], index=False)
+
+            def load_all():
+                frames = [pd.read_csv(csv_file, dtype=str) for csv_file in files]
+                count = 0
+                for previous, current in zip(frames, frames[1:]):
+                    before = {row[3]: row for row in previous.itertuples(index=False)}
+                    count += sum(before.get(row[3]) != row for row in current.itertuples(index=False))
+                return count
+
+            def stream():
+                return sum(1 for _ in snapshots.iter_deltas(files))
+
+            expected = load_all()
+            found = stream()
+            if found != expected:
+                raise AssertionError(f'streamed {found} deltas, expected {expected}')
+
+            baseline, baseline_peak = profiled(load_all)
+            streamed, streamed_peak = profiled(stream)
+            print(f'{size:>10} {found:>8} {baseline:>9.3f}s {baseline_peak / 2 ** 20:>8.1f}MB '
+                  f'{streamed:>9.3f}s {streamed_peak / 2 ** 20:>8.1f}MB')
+
+
+def bench_crawl(sizes, rate=20.0, config_file='data/config.yml'):
+    """
+    Function to run the crawler against a fault-injecting CatalogServer: transient statuses with and
+    without Retry-After, a page failing past its retries and the resumed run, a permanent 404, and the
+    request rate of the token bucket
+    :param sizes: List of tag counts to benchmark
+    :param rate: Requests per second allowed in the rate check
+    :param config_file: Path of the config file providing max_workers
+    :return: None
+    """
+    import crawler
+
+    cfg = config_functions.read_config(config_file)
+    options = {'max_workers': cfg['network']['max_workers'], 'timeout': 5, 'max_retries': 3, 'backoff': 0.01,
+               'max_delay': 2}
+    print(f'{"tags":>6} {"scenario":>12} {"requests":>9} {"seconds":>9}  result')
+
+    for size in sizes:
+        tags = [SUBJECTS[i % len(SUBJECTS)] + ('' if i < len(SUBJECTS) else str(i)) for i in range(size)]
+        pages = {f'/{tag.lower()}': synthetic_catalog_page(tag, BASE_COURSES_PER_TAG, seed=i)
+                 for i, tag in enumerate(tags)}
+        paths = list(pages)
+        expected = {tag: pages[f'/{tag.lower()}'] for tag in tags}
+
+        def run(scenario, faults, check, **overrides):
+            with tempfile.TemporaryDirectory() as directory, CatalogServer(pages, faults) as server:
+                checkpoint = crawler.CrawlCheckpoint(directory)
+                kwargs = {**options, 'rate': 0, 'checkpoint': checkpoint, **overrides}
+                try:
+                    elapsed, result = timed(course_functions.fetch_catalog, tags, server.url, **kwargs)
+                except crawler.FetchError as e:
+                    elapsed, result = None, e
+                outcome = check(result, server, checkpoint, server.url)
+                seconds = f'{elapsed:.3f}' if elapsed is not None else '-'
+                print(f'{size:>6} {scenario:>12} {len(server.requests):>9} {seconds:>9}  {outcome}')
+
+        def same_pages(result, server, checkpoint, url):
+            if result != expected:
+                raise AssertionError(f'crawl returned {result!r:.80}')
+            if checkpoint.load_manifest(url):
+                raise AssertionError('checkpoint was not cleared after a finished crawl')
+            return 'pages match'
+
+        run('clean', {}, same_pages)
+
+        # every third page fails once or twice, the 429s ask for a one second pause
+        transient = {path: [(503, None)] if index % 2 else [(500, None), (429, 1)]
+                     for index, path in enumerate(paths[::3])}
+        run('transient', transient, same_pages)
+
+        # one page fails past its retries, the resumed run only fetches that page
+        def resume(result, server, checkpoint, url):
+            if not isinstance(result, crawler.FetchError):
+                raise AssertionError('a page failing every attempt did not raise FetchError')
+            done = checkpoint.load_manifest(url)
+            before = len(server.requests)
+            server.faults.clear()
+            if course_functions.fetch_catalog(tags, url, checkpoint=checkpoint, **options) != expected:
+                raise AssertionError('resumed crawl returned different pages')
+            return f'{len(done)} pages kept, resume fetched {len(server.requests) - before}'
+
+        run('resume', {paths[-1]: [(503, 0)] * options['max_retries']}, resume, max_workers=1)
+
+        # pages checkpointed longer ago than max_age are fetched again
+        def expired(result, server, checkpoint, url):
+            before = len(server.requests)
+            server.faults.clear()
+            checkpoint.max_age = -1
+            if course_functions.fetch_catalog(tags, url, checkpoint=checkpoint, **options) != expected:
+                raise AssertionError('resumed crawl returned different pages')
+            if len(server.requests) - before != len(paths):
+                raise AssertionError('expired checkpoint pages were reused')
+            return f'expired pages dropped, resume fetched {len(server.requests) - before}'
+
+        run('expired', {paths[-1]: [(503, 0)] * options['max_retries']}, expired, max_workers=1)
+
+        def not_found(result, server, checkpoint, url):
+            if not isinstance(result, crawler.FetchError) or 'HTTP 404' not in str(result):
+                raise AssertionError('a 404 did not raise FetchError')
+            if sum(path == paths[0] for path, _ in server.requests) != 1:
+                raise AssertionError('a 404 was retried')
+            return 'FetchError without retrying'
+
+        run('404', {paths[0]: [(404, None)]}, not_found)
+
+        def rate_check(result, server, checkpoint, url):
+            times = [moment for _, moment in server.requests]
+            observed = (len(times) - 1) / (times[-1] - times[0])
+            if observed > rate * 1.1:
+                raise AssertionError(f'{observed:.1f} requests/s exceeds the {rate} requests/s limit')
+            return f'{observed:.1f} requests/s (limit {rate})'
+
+        run('rate', {}, rate_check, rate=rate, burst=1)
+
+
+# ------------------------------------------------------- main ---------------------------------------------------------
+
+# benchmark name mapped to its function and default sizes
+BENCHMARKS = {
+    'index': (bench_index, [1000, 10000, 100000]),
+    'parser': (bench_parser, [10, 100, 1000]),
+    'parsepool': (bench_parse_pool, [100, 1000]),
+    'excel': (bench_excel, [1000, 5000]),
+    'memory': (bench_memory, [1000, 10000]),
+    'fanout': (bench_fanout, [1000, 5000]),
+    'serialize': (bench_serialize, [1000, 10000]),
+    'columnar': (bench_columnar, [1000, 10000]),
+    'csv': (bench_csv, [10000, 100000]),
+    'suite': (bench_suite, [1, 10]),
+    'startup': (bench_startup, [5]),
+    'schedule': (bench_schedule, [5, 10, 40]),
+    'prereqs': (bench_prereqs, [100, 1000, 5000]),
+    'store': (bench_store, [1000, 10000]),
+    'snapshots': (bench_snapshots, [10, 100]),
+    'crawl': (bench_crawl, [33]),
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='CourseTool benchmarks')
+    parser.add_argument('benchmark', nargs='?', choices=list(BENCHMARKS))
+    parser.add_argument('--sizes', type=int, nargs='+', default=None)
+    parser.add_argument('--repeat', type=int, default=3, help='suite: timed calls per benchmark')
+    parser.add_argument('--save', help='suite: write the results to a JSON file')
+    parser.add_argument('--compare', help='suite: JSON results of an earlier run to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.2, help='suite: slowdown reported as a regression')
+    parser.add_argument('--record', metavar='URL', help='record the live catalog pages into data/fixtures and exit')
+    args = parser.parse_args()
+
+    if args.record:
+        cfg = config_functions.read_config('data/config.yml')
+        print(f'Recorded {record_fixtures(cfg["app"]["tags"], args.record, cfg["defaults"]["level"])} pages')
+        raise SystemExit(0)
+    if args.benchmark is None:
+        parser.error('a benchmark name is required')
+
+    bench, default_sizes = BENCHMARKS[args.benchmark]
+    if args.benchmark == 'suite':
+        raise SystemExit(1 if bench(args.sizes or default_sizes, repeat=args.repeat, save=args.save,
+                                    compare=args.compare, threshold=args.threshold) else 0)
+    bench(args.sizes or default_sizes)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filename: catalog_parser.py
+Author: Seth Christie
+"""
+from html import escape
+from html.parser import HTMLParser
+
+# elements serialized without a closing tag
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source',
+                 'track', 'wbr'}
+
+
+# ----------------------------------------------------- classes --------------------------------------------------------
+
+class CourseblockParser(HTMLParser):
+    """
+    Streaming extractor for Courses A-Z pages. Walks a page once and collects, for every
+    div.courseblock, the text of its p.courseblocktitle and the <br/>-separated fragments of
+    its p.courseblockdesc, both as HTML (matching BeautifulSoup's serialization) and as plain text.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.courseblocks = []
+
+        self._block_depth = 0
+        self._title = None
+        self._lines = None
+        self._texts = None
+        self._in_title = False
+        self._in_desc = False
+
+    @staticmethod
+    def _has_class(attrs, name):
+        """
+        Function to check if a tag's class attribute contains a given class
+        :param attrs: List of (name, value) attribute pairs
+        :param name: Class name to look for
+        :return: True if the class is present
+        """
+        for key, value in attrs:
+            if key == 'class' and value and name in value.split():
+                return True
+        return False
+
+    @staticmethod
+    def _serialize(tag, attrs):
+        """
+        Function to serialize a start tag the way BeautifulSoup does
+        :param tag: Tag name
+        :param attrs: List of (name, value) attribute pairs
+        :return: HTML string for the start tag
+        """
+        parts = [tag]
+        for key, value in attrs:
+            value = '' if value is None else escape(value, quote=False).replace('"', '&quot;')
+            parts.append(f'{key}="{value}"')
+        closing = '/>' if tag in VOID_ELEMENTS else '>'
+        return f'<{" ".join(parts)}{closing}'
+
+    def _append(self, raw, text=''):
+        """
+        Function to append HTML and text to the current description fragment
+        :param raw: HTML to append
+        :param text: Plain text to append
+        :return: None
+        """
+        self._lines[-1] += raw
+        self._texts[-1] += text
+
+    def handle_starttag(self, tag, attrs):
+        if not self._block_depth:
+            if tag == 'div' and self._has_class(attrs, 'courseblock'):
+                self._block_depth = 1
+                self._title = None
+                self._lines = None
+                self._texts = None
+            return
+
+        if tag == 'div':
+            self._block_depth += 1
+
+        if self._in_desc:
+            if tag == 'br':
+                self._lines.append('')
+                self._texts.append('')
+            else:
+                self._append(self._serialize(tag, attrs))
+        elif tag == 'p':
+            if self._title is None and self._has_class(attrs, 'courseblocktitle'):
+                self._title = ''
+                self._in_title = True
+            elif self._lines is None and self._has_class(attrs, 'courseblockdesc'):
+                self._lines = [self._serialize(tag, attrs)]
+                self._texts = ['']
+                self._in_desc = True
+
+    def handle_endtag(self, tag):
+        if not self._block_depth:
+            return
+
+        if tag == 'p' and self._in_title:
+            self._in_title = False
+        elif tag == 'p' and self._in_desc:
+            self._append('</p>')
+            self._in_desc = False
+        elif self._in_desc and tag not in VOID_ELEMENTS:
+            self._append(f'</{tag}>')
+
+        if tag == 'div':
+            self._block_depth -= 1
+            if not self._block_depth:
+                self._finish_block()
+
+    def handle_data(self, data):
+        if self._in_title:
+            self._title += data
+        elif self._in_desc:
+            self._append(escape(data, quote=False), data)
+
+    def _finish_block(self):
+        """
+        Function to store the courseblock that has just been closed
+        :return: None
+        """
+        self._in_title = False
+        self._in_desc = False
+        if self._title is None:
+            return
+
+        # a courseblock without a description serializes as 'None', like str() of a missing tag
+        if self._lines is None:
+            self._lines = ['None']
+            self._texts = ['None']
+
+        self.courseblocks.append((self._title, self._lines, self._texts))
+
+
+# ---------------------------------------------------- functions -------------------------------------------------------
+
+def parse_courseblocks(html_text):
+    """
+    Function to extract every courseblock from a Courses A-Z page in a single pass
+    :param html_text: HTML of the catalog page
+    :return: List of (title text, description HTML fragments, description text fragments) tuples
+    """
+    parser = CourseblockParser()
+    parser.feed(html_text)
+    parser.close()
+    return parser.courseblocks
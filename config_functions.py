@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filename: config_functions.py
+Author: Seth Christie
+"""
+import yaml
+
+# export filetype names used in config.yml mapped to file extensions
+FILETYPE_EXTENSIONS = {
+    'Excel': 'xlsx',
+    'JSON': 'json',
+    'NDJSON': 'ndjson',
+    'YAML': 'yml',
+    'Arrow': 'arrow',
+    'Parquet': 'parquet',
+}
+
+
+# ---------------------------------------------------- functions -------------------------------------------------------
+
+def read_config(filename):
+    """
+    Function to read the config file and output parameters
+    :param filename: Name of the config file
+    :return: List of config parameters
+    """
+    with open(filename, 'r') as file:
+        cfg = yaml.safe_load(file)
+    return cfg
+
+
+def get_extension(filetype):
+    """
+    Function to return the file extension for an export filetype
+    :param filetype: Filetype name from config.yml, 'Excel', 'JSON', etc.
+    :return: File extension, defaults to 'xlsx'
+    """
+    return FILETYPE_EXTENSIONS.get(filetype, 'xlsx')
+
+
+def get_catalog_url(url, level):
+    """
+    Function to return the Courses A-Z URL for a course level
+    :param url: Base Courses A-Z URL
+    :param level: Course level, 'Undergrad' or 'Grad'
+    :return: URL of the catalog for the given level
+    """
+    return f'{url}{level.lower()}/'
+
+
+def export_options(cfg):
+    """
+    Function to return the keyword arguments for export_targets from the config
+    :param cfg: Parsed config dictionary
+    :return: Dictionary of excel_writer, max_workers, executor, json_backend and yaml_backend
+    """
+    return {
+        'excel_writer': cfg['app']['excel_writer'],
+        'max_workers': cfg['export']['workers'],
+        'executor': cfg['export']['executor'],
+        'json_backend': cfg['export']['json_backend'],
+        'yaml_backend': cfg['export']['yaml_backend'],
+    }
+
+
+def network_options(cfg):
+    """
+    Function to return the keyword arguments for catalog fetching from the config
+    :param cfg: Parsed config dictionary
+    :return: Dictionary of max_workers, timeout, max_retries, backoff, rate, burst and max_delay
+    """
+    return {
+        'max_workers': cfg['network']['max_workers'],
+        'timeout': cfg['network']['timeout'],
+        'max_retries': cfg['network']['retries'],
+        'backoff': cfg['network']['backoff'],
+        'rate': cfg['network']['rate'],
+        'burst': cfg['network']['burst'],
+        'max_delay': cfg['network']['max_delay'],
+    }
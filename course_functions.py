@@ -6,22 +6,105 @@ Author: Seth Christie
 """
 import json
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
 from styleframe import StyleFrame
 import yaml
 from bs4 import BeautifulSoup, MarkupResemblesLocatorWarning
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 import warnings
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+import catalog_parser
+import crawler
+import electives
+import http_cache
+from instrumentation import logger, record, record_bytes, record_retry, timed, timer
+from models import Course, Section, to_course_dict
+
 warnings.filterwarnings("ignore", category=MarkupResemblesLocatorWarning)
 
 excel_headers = ['Tag', 'Name', 'Coreqs', 'Prereqs', 'Standing', 'Section', 'Instructor', 'Time', 'Date', 'Building',
                  'Room', 'Avail']
+columnar_headers = excel_headers + ['Credits', 'Desc']
+
+# Argos columns read by load_sections, identifiers are kept as strings so '231L' and '231' compare alike
+SECTION_DTYPES = {
+    'SUBJ': 'string',
+    'NUMB': 'string',
+    'SEC': 'string',
+    'INSTRUCTOR': 'string',
+    'M': 'string',
+    'T': 'string',
+    'W': 'string',
+    'TH': 'string',
+    'F': 'string',
+    'TIME': 'string',
+    'BLDG': 'string',
+    'ROOM': 'string',
+}
+SECTION_NUMERIC = ['AVAIL']
+
+# Argos columns only read when a caller asks for them, e.g. snapshot deltas keyed on CRN
+OPTIONAL_SECTION_DTYPES = {'CRN': 'string'}
+OPTIONAL_SECTION_NUMERIC = ['ENRL']
+
+# low-cardinality columns stored as categoricals once loaded
+SECTION_CATEGORIES = ['SUBJ', 'INSTRUCTOR', 'M', 'T', 'W', 'TH', 'F', 'TIME', 'BLDG']
+
+# network defaults (overridden by the 'network' section of config.yml)
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0
+
+# courseblock parser engine, 'fast' (single-pass HTMLParser) or 'bs4' (BeautifulSoup)
+DEFAULT_PARSER = 'fast'
+DEFAULT_PARSE_WORKERS = 1
+
+# Excel writer, 'styleframe' (styled DataFrame) or 'stream' (constant-memory openpyxl write-only)
+DEFAULT_EXCEL_WRITER = 'styleframe'
+
+# export fan-out defaults (overridden by the 'export' section of config.yml)
+DEFAULT_EXPORT_WORKERS = 4
+# 'thread' shares the prepared rows, 'process' pickles them to workers and only pays off for large xlsx batches
+DEFAULT_EXPORT_EXECUTOR = 'thread'
+
+# serializer backends, 'auto' picks orjson/libyaml when they are installed
+DEFAULT_JSON_BACKEND = 'auto'
+DEFAULT_YAML_BACKEND = 'auto'
+
+
+# --------------------------------------------------- exceptions -------------------------------------------------------
+
+class PipelineCancelled(Exception):
+    """
+    Raised when a running course pipeline is cancelled by the user
+    """
 
 
 # -------------------------------------------------- functions ---------------------------------------------------------
 
+def check_cancelled(cancel):
+    """
+    Function to stop the pipeline if cancellation was requested
+    :param cancel: threading.Event set when the run should stop, or None
+    :return: None
+    """
+    if cancel is not None and cancel.is_set():
+        raise PipelineCancelled()
+
+
 def strip_html(html_text):
     """
     Function to strip HTML code from a String
@@ -33,7 +116,11 @@ def strip_html(html_text):
     return plain_text
 
 
-def get_course_data(csv_file, tags, catalog_url, export_all):
+def get_course_data(csv_file, tags, catalog_url, export_all, max_workers=DEFAULT_MAX_WORKERS,
+                    timeout=DEFAULT_TIMEOUT, max_retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, cache=None,
+                    parser=DEFAULT_PARSER, progress=None, cancel=None, parsed_cache=None, chunksize=None,
+                    parse_workers=DEFAULT_PARSE_WORKERS, rate=crawler.DEFAULT_RATE, burst=crawler.DEFAULT_BURST,
+                    max_delay=crawler.DEFAULT_MAX_DELAY, checkpoint=None):
     """
     Function to parse through Kettering Courses A-Z and the Kettering
     Argos Class Schedule to create a dictionary containing available courses
@@ -42,77 +129,222 @@ def get_course_data(csv_file, tags, catalog_url, export_all):
     :param tags: List of acceptable course tags
     :param catalog_url: URL to the course catalog (undergrad/grad)
     :param export_all: Should the function include courses with no sections?
-    :return: Dictionary containing a list of available courses
+    :param max_workers: Maximum number of catalog pages fetched at once
+    :param timeout: Timeout in seconds for each page request
+    :param max_retries: Number of attempts per page before giving up
+    :param backoff: Base delay in seconds for the exponential retry backoff
+    :param cache: Optional ResponseCache for catalog pages
+    :param parser: Courseblock parser engine, 'fast' or 'bs4'
+    :param progress: Optional callback progress(stage, name, done, total) called as each tag is fetched and parsed
+    :param cancel: Optional threading.Event that stops the run with PipelineCancelled when set
+    :param parsed_cache: Optional ParsedCatalogCache used to skip re-parsing unchanged pages
+    :param chunksize: Optional number of CSV rows read at a time
+    :param parse_workers: Number of worker processes parsing catalog pages, 1 parses in this process
+    :param rate: Average requests per second sent to the catalog host, 0 for no limit
+    :param burst: Requests that may be sent at once before the rate applies
+    :param max_delay: Longest wait in seconds between attempts
+    :param checkpoint: Optional CrawlCheckpoint letting an interrupted fetch resume
+    :return: Dictionary mapping each tag to its available Courses
     """
-    course_list = {}
-    df = None
+    df = load_sections(csv_file, tags=tags, chunksize=chunksize)
+    pages = fetch_catalog(tags, catalog_url, max_workers=max_workers, timeout=timeout, max_retries=max_retries,
+                          backoff=backoff, cache=cache, progress=progress, cancel=cancel, rate=rate, burst=burst,
+                          max_delay=max_delay, checkpoint=checkpoint)
+    catalog = parse_catalog(pages, parser=parser, progress=progress, cancel=cancel, parsed_cache=parsed_cache,
+                            workers=parse_workers)
+
+    return join_sections(catalog, index_sections(df), export_all)
+
+
+@timed('load_sections')
+def load_sections(csv_file, tags=None, chunksize=None, extra_columns=()):
+    """
+    Function to load the Argos class schedule into a dataframe, reading only the columns the
+    tool uses with explicit dtypes
+    :param csv_file: Specified csv file from Argos
+    :param tags: Optional list of subjects to keep, other rows are dropped while reading
+    :param chunksize: Optional number of rows read at a time, keeps large multi-term dumps out of memory
+    :param extra_columns: Optional columns from OPTIONAL_SECTION_DTYPES or OPTIONAL_SECTION_NUMERIC to read too
+    :return: Dataframe containing sections, or None if the file was not found
+    """
+    columns = set(SECTION_DTYPES) | set(SECTION_NUMERIC) | set(extra_columns)
+    dtypes = {**SECTION_DTYPES, **{column: dtype for column, dtype in OPTIONAL_SECTION_DTYPES.items()
+                                   if column in columns}}
+    tags = set(tags) if tags is not None else None
+
     try:
-        df = pd.read_csv(csv_file)
-        # drop useless columns
-        df = df.drop(columns=['TYPE', 'PART', 'MAX', 'WL_Max', 'WL_Actual', 'CAMPUS'])
+        reader = pd.read_csv(csv_file, usecols=lambda column: column in columns, dtype=dtypes,
+                             chunksize=chunksize)
     except FileNotFoundError as e:
-        print(f'[CourseTool] CSV file was not found: {e}')
+        logger.error(f'CSV file was not found: {e}', extra={'stage': 'load_sections', 'csv_file': csv_file})
+        return None
+
+    frames = []
+    for chunk in (reader if chunksize else [reader]):
+        if tags is not None:
+            chunk = chunk[chunk['SUBJ'].isin(tags)]
+        frames.append(chunk)
+
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].reset_index(drop=True)
+    return df.astype({column: 'category' for column in SECTION_CATEGORIES if column in df})
+
+
+def fetch_catalog(tags, catalog_url, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT,
+                  max_retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, cache=None, progress=None, cancel=None,
+                  rate=crawler.DEFAULT_RATE, burst=crawler.DEFAULT_BURST, max_delay=crawler.DEFAULT_MAX_DELAY,
+                  checkpoint=None):
+    """
+    Function to download the Courses A-Z page of every tag
+    :param tags: List of acceptable course tags
+    :param catalog_url: URL to the course catalog (undergrad/grad)
+    :param max_workers: Maximum number of catalog pages fetched at once
+    :param timeout: Timeout in seconds for each page request
+    :param max_retries: Number of attempts per page before giving up
+    :param backoff: Base delay in seconds for the exponential retry backoff
+    :param cache: Optional ResponseCache for catalog pages
+    :param progress: Optional callback progress('fetch', url, done, total) called as each page arrives
+    :param cancel: Optional threading.Event that stops the run with PipelineCancelled when set
+    :param rate: Average requests per second sent to the catalog host, 0 for no limit
+    :param burst: Requests that may be sent at once before the rate applies
+    :param max_delay: Longest wait in seconds between attempts
+    :param checkpoint: Optional CrawlCheckpoint, pages fetched by an interrupted run are not fetched again
+    :return: Dictionary mapping each tag to the HTML of its page, in tag order
+    """
+    pages = checkpoint.load(catalog_url) if checkpoint is not None else {}
+    if pages:
+        logger.info(f'Resuming {catalog_url}, {len(pages)} of {len(tags)} pages were already fetched',
+                    extra={'stage': 'fetch', 'url': catalog_url})
+
+    # every page is checkpointed as it arrives, so a failed page loses none of the others
+    tag_urls = {f'{catalog_url}{tag.lower()}': tag for tag in tags if tag not in pages}
+    on_page = None
+    if checkpoint is not None:
+        def on_page(url, response):
+            checkpoint.add(catalog_url, tag_urls[url], response.text)
+
+    # fetch the remaining tag pages concurrently, responses come back in tag order
+    if tag_urls:
+        responses = fetch_pages(list(tag_urls), max_workers=max_workers, timeout=timeout, max_retries=max_retries,
+                                backoff=backoff, cache=cache, progress=progress, cancel=cancel,
+                                limiter=crawler.TokenBucket(rate, burst), max_delay=max_delay, on_page=on_page)
+        pages.update((tag, response.text) for tag, response in zip(tag_urls.values(), responses))
+
+    if checkpoint is not None:
+        checkpoint.clear(catalog_url)
+    return {tag: pages[tag] for tag in tags}
+
+
+def parse_catalog(pages, parser=DEFAULT_PARSER, progress=None, cancel=None, parsed_cache=None,
+                  workers=DEFAULT_PARSE_WORKERS):
+    """
+    Function to parse every course out of the Courses A-Z pages
+    :param pages: Dictionary mapping each tag to the HTML of its page
+    :param parser: Courseblock parser engine, 'fast' or 'bs4'
+    :param progress: Optional callback progress('parse', tag, done, total) called as each tag is parsed
+    :param cancel: Optional threading.Event that stops the run with PipelineCancelled when set
+    :param parsed_cache: Optional ParsedCatalogCache, pages whose hash is already stored are not parsed again
+    :param workers: Number of worker processes parsing pages at once, 1 parses in this process
+    :return: Dictionary mapping each tag to its courses, without sections, in page order
+    """
+    parsed = {}
+    keys = {}
+    done = 0
+
+    def finish(tag, courses):
+        nonlocal done
+        parsed[tag] = courses
+        if parsed_cache is not None:
+            parsed_cache.store(keys[tag], courses)
+
+        done += 1
+        if progress is not None:
+            progress('parse', tag, done, len(pages))
+
+    # reuse the stored result of every page that has not changed since it was last parsed
+    misses = []
+    for tag, html_text in pages.items():
+        check_cancelled(cancel)
+        if parsed_cache is not None:
+            keys[tag] = parsed_cache.page_hash(html_text, parser)
+            courses = parsed_cache.get(keys[tag])
+            if courses is not None:
+                parsed[tag] = courses
+                done += 1
+                if progress is not None:
+                    progress('parse', tag, done, len(pages))
+                continue
+        misses.append(tag)
+
+    if workers <= 1 or len(misses) <= 1:
+        for tag in misses:
+            check_cancelled(cancel)
+            courses, seconds = timed_parse(pages[tag], parser)
+            record('parse', seconds, tag)
+            finish(tag, courses)
+    else:
+        # pages go out to the workers as text and come back as plain course dictionaries
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(misses)))
+        try:
+            futures = {executor.submit(timed_parse, pages[tag], parser): tag for tag in misses}
+            for future in as_completed(futures):
+                check_cancelled(cancel)
+                courses, seconds = future.result()
+                record('parse', seconds, futures[future])
+                finish(futures[future], courses)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    # workers finish in any order, the catalog always follows the page order
+    return {tag: parsed[tag] for tag in pages}
+
+
+def parse_page(html_text, parser=DEFAULT_PARSER):
+    """
+    Function to parse every course out of a single Courses A-Z page
+    :param html_text: HTML of the catalog page
+    :param parser: Courseblock parser engine, 'fast' or 'bs4'
+    :return: Dictionary mapping each course tag to its course dictionary, without sections
+    """
+    courses = {}
+    for title, courseblockdesc, desc_texts in get_courseblocks(html_text, parser):
+        courseblocktitle = title.split('\xa0')
+        courses[courseblocktitle[0]] = parse_courseblock(courseblocktitle, courseblockdesc, desc_texts)
+    return courses
 
-    for tag in tags:
-        courses = {}
-        tag_url = f'{catalog_url}{tag.lower()}'
-        print(f'[CourseTool] Retrieving courses from {tag_url}')
 
-        # send HTML content request to page
-        response = retry_get(tag_url)
+def timed_parse(html_text, parser=DEFAULT_PARSER):
+    """
+    Function to parse a page and measure it, so worker processes can report their timings
+    :param html_text: HTML of the catalog page
+    :param parser: Courseblock parser engine, 'fast' or 'bs4'
+    :return: Tuple of (courses parsed from the page, seconds spent parsing it)
+    """
+    start = time.perf_counter()
+    courses = parse_page(html_text, parser)
+    return courses, time.perf_counter() - start
 
-        courseblocks = BeautifulSoup(response.text, 'html.parser').find_all('div', 'courseblock')
-        for courseblock in courseblocks:
-            courseblocktitle = courseblock.find('p', 'courseblocktitle').text.split('\xa0')
 
+@timed('join_sections')
+def join_sections(catalog, section_index, export_all):
+    """
+    Function to join the parsed catalog with the sections offered in a term
+    :param catalog: Parsed catalog from parse_catalog
+    :param section_index: Section index built by index_sections, or None if there is no CSV
+    :param export_all: Should the function include courses with no sections?
+    :return: Dictionary mapping each tag to its available Courses
+    """
+    course_list = {}
+
+    for tag, catalog_courses in catalog.items():
+        courses = {}
+
+        for course_id, course in catalog_courses.items():
             # if dataframe exists, check if course exists in dataframe
-            if df is not None:
-                subjects = df['SUBJ'].values
-                tags = df['NUMB'].values
-                courseids = [f'{subject}-{tag}' for subject, tag in zip(subjects, tags)]
-
-                if courseblocktitle[0] not in courseids and not export_all:
-                    continue
-
-            courseblockdesc = str(courseblock.find('p', 'courseblockdesc')).split('<br/>')
-
-            # default values
-            coreqs = 'None'
-            prereqs = 'None'
-            standing = 'None'
-            desc = strip_html(courseblockdesc[-3]).replace('\n', ' ')
-
-            for line in courseblockdesc:
-                # check for class standing
-                if 'Minimum Class Standing:' in line:
-                    standing = line.split(':')[1].strip()
-
-                # check for prereqs
-                if 'Prerequisites:' in line:
-                    prereqs = strip_html(line).replace('Prerequisites: ', '')
-
-                # check for coreqs
-                if 'Corequisites:' in line:
-                    coreqs = strip_html(line).replace('Corequisites: ', '')
-
-                # check if course is a special topics course
-            if '391' in courseblocktitle[0]:
-                desc = 'None'
-
-            # format course dictionary
-            course = {
-                'tag': courseblocktitle[0],
-                'name': courseblocktitle[2].replace('\n', ''),
-                'coreqs': coreqs.replace('\n', ''),
-                'prereqs': prereqs.replace('\n', ''),
-                'standing': standing,
-                'desc': desc.replace('  ', ' '),
-                'credits': courseblocktitle[-1].replace(' Credits', ''),
-                'sections': get_sections(df, courseblocktitle),
-            }
+            if section_index is not None and course_id not in section_index and not export_all:
+                continue
 
             # add course into tag courses
-            courses[courseblocktitle[0]] = course
+            courses[course_id] = Course.from_dict(course, get_sections(section_index, [course_id]))
 
         # add tag courses into final course list
         course_list[tag] = courses
@@ -120,205 +352,606 @@ def get_course_data(csv_file, tags, catalog_url, export_all):
     return course_list
 
 
-def get_sections(df, course):
+def get_courseblocks(html_text, parser=DEFAULT_PARSER):
     """
-    Function to return a dictionary containing each section for a given course
+    Function to extract the raw courseblocks from a Courses A-Z page
+    :param html_text: HTML of the catalog page
+    :param parser: Parser engine, 'fast' for the single-pass extractor or 'bs4' for BeautifulSoup
+    :return: List of (title text, description HTML fragments, description text fragments or None) tuples
+    """
+    if parser == 'fast':
+        return catalog_parser.parse_courseblocks(html_text)
+
+    courseblocks = []
+    for courseblock in BeautifulSoup(html_text, 'html.parser').find_all('div', 'courseblock'):
+        title = courseblock.find('p', 'courseblocktitle').text
+        courseblockdesc = str(courseblock.find('p', 'courseblockdesc')).split('<br/>')
+        courseblocks.append((title, courseblockdesc, None))
+    return courseblocks
+
+
+def parse_courseblock(courseblocktitle, courseblockdesc, desc_texts=None):
+    """
+    Function to build a course dictionary (without sections) from a raw courseblock
+    :param courseblocktitle: Course title split on non-breaking spaces
+    :param courseblockdesc: Description HTML split on <br/>
+    :param desc_texts: Plain text of each description fragment, stripped on demand if None
+    :return: Dictionary containing the course
+    """
+    def text(index):
+        if desc_texts is not None:
+            return desc_texts[index]
+        return strip_html(courseblockdesc[index])
+
+    # default values
+    coreqs = 'None'
+    prereqs = 'None'
+    standing = 'None'
+    desc = text(-3).replace('\n', ' ')
+
+    for index, line in enumerate(courseblockdesc):
+        # check for class standing
+        if 'Minimum Class Standing:' in line:
+            standing = line.split(':')[1].strip()
+
+        # check for prereqs
+        if 'Prerequisites:' in line:
+            prereqs = text(index).replace('Prerequisites: ', '')
+
+        # check for coreqs
+        if 'Corequisites:' in line:
+            coreqs = text(index).replace('Corequisites: ', '')
+
+    # check if course is a special topics course
+    if '391' in courseblocktitle[0]:
+        desc = 'None'
+
+    # format course dictionary
+    return {
+        'tag': courseblocktitle[0],
+        'name': courseblocktitle[2].replace('\n', ''),
+        'coreqs': coreqs.replace('\n', ''),
+        'prereqs': prereqs.replace('\n', ''),
+        'standing': standing,
+        'desc': desc.replace('  ', ' '),
+        'credits': courseblocktitle[-1].replace(' Credits', ''),
+    }
+
+
+@timed('index_sections')
+def index_sections(df):
+    """
+    Function to build the sections of every course in the Argos dataframe at once
     :param df: Dataframe containing sections
+    :return: Dictionary mapping 'SUBJ-NUMB' to a tuple of Sections, or None if there is no dataframe
+    """
+    if df is None:
+        return None
+
+    # join the day columns column-wise, skipping the ' ' placeholders
+    date = None
+    for column in ['M', 'T', 'W', 'TH', 'F']:
+        days = df[column].astype(object).fillna(' ').astype(str)
+        piece = days.where(days == ' ', days + ', ').replace(' ', '')
+        date = piece if date is None else date + piece
+    date = date.str[:-2]
+
+    course_ids = df['SUBJ'].astype(str) + '-' + df['NUMB'].astype(str)
+
+    # plain Python values so the sections serialize like the rest of the catalog
+    def values(column):
+        return df[column].astype(object).where(df[column].notna(), None).tolist()
+
+    # key by section number first so a repeated section keeps its last row, as before
+    index = {}
+    for course_id, section, instructor, time_, date_, building, room, avail in zip(
+            course_ids.tolist(), values('SEC'), values('INSTRUCTOR'), values('TIME'), date.tolist(), values('BLDG'),
+            values('ROOM'), df['AVAIL'].tolist()):
+        index.setdefault(course_id, {})[section] = Section(section, instructor, time_, date_, building, room, avail)
+
+    return {course_id: tuple(sections.values()) for course_id, sections in index.items()}
+
+
+@timed('get_sections')
+def get_sections(section_index, course):
+    """
+    Function to return the sections for a given course
+    :param section_index: Section index built by index_sections
     :param course: Course tag 'MATH-204', 'ECON-201', etc.
-    :return: Dictionary containing sections for a given course
+    :return: Tuple of Sections for a given course
     """
-    sections = {}
-    title_parts = course[0].split('-')
+    if section_index is None:
+        return ()
 
-    if df is None:
-        return sections
+    return section_index.get(course[0], ())
+
+
+def course_rows(course):
+    """
+    Function to flatten a single Course into one row per section
+    :param course: Course to be flattened
+    :return: List of rows in excel_headers order
+    """
+    head = [course.tag, course.name, course.coreqs, course.prereqs, course.standing]
+
+    if not course.sections:
+        return [head + [None] * 7]
+
+    return [head + [section.section, section.instructor, section.time, section.date, section.building, section.room,
+                    section.avail] for section in course.sections]
 
-    df_sections = df[(df['SUBJ'] == title_parts[0]) & (df['NUMB'] == title_parts[1])].copy()
-    dict_sections = df_sections.to_dict(orient='records')
 
-    for entry in dict_sections:
-        # Parse course dates
-        dates = [entry['M'], entry['T'], entry['W'], entry['TH'], entry['F']]
-        dates = [item for item in dates if item != ' ']
+def course_records(course):
+    """
+    Function to flatten a single Course into columnar records, one per section
+    :param course: Course to be flattened
+    :return: List of records in columnar_headers order
+    """
+    return [row + [course.credits, course.desc] for row in course_rows(course)]
 
-        # Get section data
-        section = entry['SEC']
-        instructor = entry['INSTRUCTOR']
-        time = entry['TIME']
-        date = ', '.join(dates)
-        building = entry['BLDG']
-        room = entry['ROOM']
-        avail = entry['AVAIL']
 
-        # Format section block
-        sectionblock = {
-            'instructor': instructor,
-            'time': time,
-            'date': date,
-            'building': building,
-            'room': room,
-            'avail': avail
-        }
+def iter_course_rows(courses):
+    """
+    Function to flatten a Dictionary of Courses into one row per section
+    :param courses: Dictionary mapping each subject to its Courses
+    :return: Generator of rows in excel_headers order
+    """
+    for subject in courses.values():
+        for course in subject.values():
+            yield from course_rows(course)
 
-        # Dump block into sections
-        sections[section] = sectionblock
 
-    return sections
+@timed('rows_to_df')
+def rows_to_df(rows, headers=None):
+    """
+    Function to convert export rows into a StyleFrame for the styled Excel writer
+    :param rows: List of rows in headers order
+    :param headers: Column titles, defaults to excel_headers
+    :return: StyleFrame containing courses
+    """
+    return StyleFrame(pd.DataFrame(rows, columns=headers or excel_headers))
 
 
-def get_mech_electives(self, courses):
+def get_column_widths(rows, headers=None):
     """
-    Function to return a dictionary containing all courses eligible as ME Electives
-    :param self: Tkinter interface
-    :param courses: Dictionary containing all the courses
-    :return: Dictionary containing all ME Elective options
+    Function to compute best fit column widths with a running maximum over the rows
+    :param rows: Iterable of rows in headers order
+    :param headers: Column titles, defaults to excel_headers
+    :return: List of column widths in headers order
     """
-    electives = {}
+    longest = [0] * len(headers or excel_headers)
+    for row in rows:
+        for index, value in enumerate(row):
+            if value is not None and len(str(value)) > longest[index]:
+                longest[index] = len(str(value))
 
-    for tag in courses.keys():
-        courseblock = {}
+    # same sizing rule as StyleFrame best_fit
+    return [(length + StyleFrame.A_FACTOR) * StyleFrame.P_FACTOR for length in longest]
 
-        for course in courses[tag].keys():
-            tag, num = course.split('-')
-            if len(num) > 3:
-                num = num[:-1]
 
-            # Check if course is > 300 and < 600
-            if not (300 <= int(num) < 600):
-                continue
+def write_excel_stream(rows, filename, headers=None):
+    """
+    Function to stream rows into an Excel workbook without building a DataFrame
+    :param rows: Callable returning a fresh iterator over the rows, called once for the widths and once to write
+    :param filename: Name and location of the export
+    :param headers: Column titles, defaults to excel_headers
+    :return: None
+    """
+    headers = headers or excel_headers
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
 
-            # Check course against filter
-            if (tag in self.parent.MISC_CFILTER or num in self.parent.MISC_CFILTER
-                or course in self.parent.MISC_CFILTER) and course not in self.parent.MISC_CAFILTER:
-                continue
+    # write-only sheets need their column widths before the first row is written
+    for index, width in enumerate(get_column_widths(rows(), headers), start=1):
+        sheet.column_dimensions[get_column_letter(index)].width = width
+
+    header = []
+    for title in headers:
+        cell = WriteOnlyCell(sheet, value=title)
+        cell.font = Font(bold=True)
+        header.append(cell)
+    sheet.append(header)
 
-            courseblock[course] = courses[tag][course]
+    for row in rows():
+        sheet.append(row)
 
-        if not courseblock:
-            continue
+    workbook.save(filename)
 
-        electives[tag] = courseblock
 
-    return electives
+def dump_json(course_dict, filename, backend=DEFAULT_JSON_BACKEND):
+    """
+    Function to write a course dictionary as indented JSON
+    :param course_dict: Nested course dictionary
+    :param filename: Name and location of the export
+    :param backend: 'orjson', 'json', or 'auto' to use orjson when it is installed
+    :return: None
+    """
+    if backend != 'json' and orjson is not None:
+        with open(filename, 'wb') as file:
+            file.write(orjson.dumps(course_dict, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        return
 
+    with open(filename, 'w', encoding='utf-8') as file:
+        json.dump(course_dict, file, ensure_ascii=False, indent=2)
 
-def get_adv_electives(self, courses):
+
+def dump_ndjson(course_dict, filename, backend=DEFAULT_JSON_BACKEND):
     """
-    Function to return a dictionary containing all courses eligible as Advanced electives
-    :param self: Tkinter interface
-    :param courses: Dictionary containing all the courses
-    :return: Dictionary containing all Advanced Elective options
+    Function to write a course dictionary as compact NDJSON, one course per line
+    :param course_dict: Nested course dictionary
+    :param filename: Name and location of the export
+    :param backend: 'orjson', 'json', or 'auto' to use orjson when it is installed
+    :return: None
     """
-    electives = {}
+    if backend != 'json' and orjson is not None:
+        with open(filename, 'wb') as file:
+            for subject in course_dict.values():
+                for course in subject.values():
+                    file.write(orjson.dumps(course, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE))
+        return
 
-    for tag in courses.keys():
-        courseblock = {}
+    with open(filename, 'w', encoding='utf-8') as file:
+        for subject in course_dict.values():
+            for course in subject.values():
+                file.write(json.dumps(course, ensure_ascii=False, separators=(',', ':')) + '\n')
 
-        for course in courses[tag].keys():
-            tag, num = course.split('-')
-            if len(num) > 3:
-                num = num[:-1]
 
-            # Check if course is > 300 and < 600
-            if not (int(num) < 600):
-                continue
+def dump_yaml(course_dict, filename, backend=DEFAULT_YAML_BACKEND):
+    """
+    Function to write a course dictionary as YAML
+    :param course_dict: Nested course dictionary
+    :param filename: Name and location of the export
+    :param backend: 'libyaml', 'python', or 'auto' to use the libyaml emitter when PyYAML was built with it
+    :return: None
+    """
+    dumper = yaml.Dumper
+    if backend != 'python' and yaml.__with_libyaml__:
+        dumper = yaml.CDumper
 
-            # Check course against filter
-            if (tag in self.parent.MISC_ADVFILTER or num in self.parent.MISC_ADVFILTER
-                    or course in self.parent.MISC_ADVFILTER):
-                continue
+    with open(filename, 'w', encoding='utf-8') as file:
+        yaml.dump(course_dict, file, Dumper=dumper)
 
-            courseblock[course] = courses[tag][course]
-
-        if not courseblock:
-            continue
-
-        electives[tag] = courseblock
-
-    return electives
-
-
-def dict_to_df(courses):
-    """
-    Function to convert a Dictionary of courses into a Pandas DataFrame
-    :param courses: Dictionary containing courses
-    :return: DataFrame containing courses
-    """
-    data = []
-
-    for subject in courses:
-        for courseblock in courses[subject]:
-            if not courses[subject][courseblock]['sections']:
-                data.append([
-                    courses[subject][courseblock]['tag'],
-                    courses[subject][courseblock]['name'],
-                    courses[subject][courseblock]['coreqs'],
-                    courses[subject][courseblock]['prereqs'],
-                    courses[subject][courseblock]['standing'],
-                    None,
-                    None,
-                    None,
-                    None,
-                    None,
-                    None,
-                    None
-                ])
-            else:
-                for section in courses[subject][courseblock]['sections']:
-                    data.append([
-                        courses[subject][courseblock]['tag'],
-                        courses[subject][courseblock]['name'],
-                        courses[subject][courseblock]['coreqs'],
-                        courses[subject][courseblock]['prereqs'],
-                        courses[subject][courseblock]['standing'],
-                        section,
-                        courses[subject][courseblock]['sections'][section]['instructor'],
-                        courses[subject][courseblock]['sections'][section]['time'],
-                        courses[subject][courseblock]['sections'][section]['date'],
-                        courses[subject][courseblock]['sections'][section]['building'],
-                        courses[subject][courseblock]['sections'][section]['room'],
-                        courses[subject][courseblock]['sections'][section]['avail'],
-                    ])
-    return StyleFrame(pd.DataFrame(data, columns=excel_headers))
-
-
-def export_courses(courses, filetype, filename):
-    """
-    Function to export a dictionary of courses to a given file format
-    :param courses: Dictionary of courses to be exported
-    :param filetype: File format for the export
+
+def write_columnar(records, filename, filetype, headers=None):
+    """
+    Function to write columnar records as an Arrow IPC (Feather) or Parquet file
+    :param records: List of records in headers order
     :param filename: Name and location of the export
+    :param filetype: 'arrow' for uncompressed Arrow IPC, which can be memory-mapped, or 'parquet'
+    :param headers: Column titles, defaults to columnar_headers
     :return: None
     """
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError('Arrow and Parquet exports require pyarrow (pip install pyarrow)') from e
+
+    headers = headers or columnar_headers
+    columns = list(zip(*records)) if records else [()] * len(headers)
+    arrays = {}
+    for header, values in zip(headers, columns):
+        if header in ('Avail', 'Schedule'):
+            arrays[header] = pa.array(values, type=pa.int64(), from_pandas=True)
+        else:
+            # section numbers and rooms can be read as numbers or strings, store them all as strings
+            arrays[header] = pa.array([None if value is None else str(value) for value in values], type=pa.string())
+    table = pa.table(arrays)
+
+    if filetype == 'parquet':
+        pq.write_table(table, filename)
+    else:
+        feather.write_feather(table, filename, compression='uncompressed')
+
+
+def load_columnar(filename, as_pandas=True):
+    """
+    Function to load a columnar export, memory-mapping Arrow IPC files instead of reading them
+    :param filename: Path of an .arrow or .parquet export
+    :param as_pandas: Convert the table to a pandas DataFrame
+    :return: DataFrame, or pyarrow Table if as_pandas is False
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if filename.endswith('.parquet'):
+        table = pq.read_table(filename, memory_map=True)
+    else:
+        table = pa.ipc.open_file(pa.memory_map(filename, 'r')).read_all()
+
+    return table.to_pandas() if as_pandas else table
+
+
+def write_export(filetype, filename, excel_writer=DEFAULT_EXCEL_WRITER, course_dict=None, rows=None,
+                 json_backend=DEFAULT_JSON_BACKEND, yaml_backend=DEFAULT_YAML_BACKEND, headers=None):
+    """
+    Function to write export data that has already been prepared
+    :param filetype: File format for the export
+    :param filename: Name and location of the export
+    :param excel_writer: Excel writer, 'stream' for the constant-memory writer or 'styleframe'
+    :param course_dict: Nested course dictionary, required for JSON, NDJSON and YAML
+    :param rows: List of rows in excel_headers order for Excel, or columnar_headers order for Arrow/Parquet
+    :param json_backend: JSON serializer, 'auto', 'orjson' or 'json'
+    :param yaml_backend: YAML emitter, 'auto', 'libyaml' or 'python'
+    :param headers: Column titles of the rows, defaults to excel_headers or columnar_headers
+    :return: Name of the written export
+    """
     match filetype:
         case 'json':
-            with open(filename, 'w', encoding='utf-8') as file:
-                json.dump(courses, file, ensure_ascii=False, indent=2)
+            dump_json(course_dict, filename, json_backend)
+
+        case 'ndjson':
+            dump_ndjson(course_dict, filename, json_backend)
 
-        case 'yaml':
-            with open(filename, 'w', encoding='utf-8') as file:
-                yaml.dump(courses, file)
+        case 'yaml' | 'yml':
+            dump_yaml(course_dict, filename, yaml_backend)
+
+        case 'arrow' | 'parquet':
+            write_columnar(rows, filename, filetype, headers)
+
+        case 'xlsx' if excel_writer == 'stream':
+            write_excel_stream(lambda: iter(rows), filename, headers)
 
         case 'xlsx':
             with StyleFrame.ExcelWriter(filename) as writer:
-                sf = dict_to_df(courses)
+                sf = rows_to_df(rows, headers)
                 sf.to_excel(
                     excel_writer=writer,
-                    best_fit=excel_headers
+                    best_fit=headers or excel_headers
                 )
 
         case _:
-            with open(filename, 'w', encoding='utf-8') as file:
-                json.dump(courses, file, ensure_ascii=False, indent=2)
+            dump_json(course_dict, filename, json_backend)
 
-    print(f'[CourseTool] Exported courses to {filename}.')
+    logger.info(f'Exported courses to {filename}.', extra={'stage': 'export', 'path': filename})
+    return filename
 
 
-def retry_get(url, max_retries=3):
-  for attempt in range(max_retries):
-    try:
-      response = requests.get(url)
-      return response
-    except Exception as e:
-      print(f"[CourseTool] Attempt {attempt + 1} failed: {e}")
-      time.sleep(1)  # wait 1 second before retrying
\ No newline at end of file
+def timed_export(filetype, filename, excel_writer=DEFAULT_EXCEL_WRITER, **data):
+    """
+    Function to write an export and measure it, so worker processes can report their timings
+    :param filetype: File format for the export
+    :param filename: Name and location of the export
+    :param excel_writer: Excel writer, 'stream' for the constant-memory writer or 'styleframe'
+    :param data: Keyword arguments passed on to write_export
+    :return: Tuple of (name of the written export, seconds spent writing it)
+    """
+    start = time.perf_counter()
+    filename = write_export(filetype, filename, excel_writer, **data)
+    return filename, time.perf_counter() - start
+
+
+def export_courses(courses, filetype, filename, excel_writer=DEFAULT_EXCEL_WRITER, json_backend=DEFAULT_JSON_BACKEND,
+                   yaml_backend=DEFAULT_YAML_BACKEND):
+    """
+    Function to export a dictionary of Courses to a given file format
+    :param courses: Dictionary mapping each subject to the Courses to be exported
+    :param filetype: File format for the export
+    :param filename: Name and location of the export
+    :param excel_writer: Excel writer, 'stream' for the constant-memory writer or 'styleframe'
+    :param json_backend: JSON serializer, 'auto', 'orjson' or 'json'
+    :param yaml_backend: YAML emitter, 'auto', 'libyaml' or 'python'
+    :return: None
+    """
+    with timer('export', filename):
+        if filetype == 'xlsx' and excel_writer == 'stream':
+            write_excel_stream(lambda: iter_course_rows(courses), filename)
+            logger.info(f'Exported courses to {filename}.', extra={'stage': 'export', 'path': filename})
+        elif filetype in ('arrow', 'parquet'):
+            records = [record for subject in courses.values() for course in subject.values()
+                       for record in course_records(course)]
+            write_export(filetype, filename, excel_writer, rows=records)
+        elif filetype == 'xlsx':
+            write_export(filetype, filename, excel_writer, rows=list(iter_course_rows(courses)))
+        else:
+            write_export(filetype, filename, excel_writer, course_dict=to_course_dict(courses),
+                         json_backend=json_backend, yaml_backend=yaml_backend)
+
+
+def export_targets(courses, targets, rules=(), excel_writer=DEFAULT_EXCEL_WRITER, max_workers=DEFAULT_EXPORT_WORKERS,
+                   executor=DEFAULT_EXPORT_EXECUTOR, json_backend=DEFAULT_JSON_BACKEND,
+                   yaml_backend=DEFAULT_YAML_BACKEND, subsets=None):
+    """
+    Function to write several exports of one catalog at once. Elective filters are evaluated
+    in a single pass, every course is flattened and converted only once, and the files are
+    written concurrently on a worker pool.
+    :param courses: Dictionary mapping each subject to its Courses
+    :param targets: List of (filter, filetype, filename) tuples, filter is None for the full catalog or a rule name
+    :param rules: List of ElectiveRules that target filters refer to
+    :param excel_writer: Excel writer, 'stream' for the constant-memory writer or 'styleframe'
+    :param max_workers: Maximum number of exports written at once
+    :param executor: Worker pool kind, 'thread' (default) or 'process' (opt-in for large xlsx batches, each job's
+        data is pickled to its worker)
+    :param json_backend: JSON serializer, 'auto', 'orjson' or 'json'
+    :param yaml_backend: YAML emitter, 'auto', 'libyaml' or 'python'
+    :param subsets: Optional elective courses already filtered per rule name, e.g. by CourseStore.get_electives
+    :return: List of written filenames in target order
+    """
+    names = {name for name, _, _ in targets if name is not None}
+    if subsets is None:
+        subsets = electives.get_electives(courses, [rule for rule in rules if rule.name in names])
+    subsets = {None: courses, **subsets}
+
+    # flatten and convert every course once, shared by all targets
+    rows_by_course = {}
+    records_by_course = {}
+    dicts_by_course = {}
+    payloads = {}
+
+    def payload(name, filetype):
+        match filetype:
+            case 'xlsx':
+                kind, flatten, cache = 'rows', course_rows, rows_by_course
+            case 'arrow' | 'parquet':
+                kind, flatten, cache = 'records', course_records, records_by_course
+            case _:
+                kind, flatten, cache = 'course_dict', None, dicts_by_course
+        if (name, kind) in payloads:
+            return payloads[(name, kind)]
+
+        subset = subsets[name]
+        if flatten is not None:
+            data = []
+            for subject in subset.values():
+                for course_id, course in subject.items():
+                    if course_id not in cache:
+                        cache[course_id] = flatten(course)
+                    data.extend(cache[course_id])
+        else:
+            data = {}
+            for subject, subject_courses in subset.items():
+                data[subject] = {}
+                for course_id, course in subject_courses.items():
+                    if course_id not in cache:
+                        cache[course_id] = course.to_dict()
+                    data[subject][course_id] = cache[course_id]
+
+        payloads[(name, kind)] = {'course_dict' if flatten is None else 'rows': data}
+        return payloads[(name, kind)]
+
+    jobs = [(filetype, filename, {**payload(name, filetype), 'json_backend': json_backend,
+                                  'yaml_backend': yaml_backend}) for name, filetype, filename in targets]
+
+    # a single export is not worth starting a pool for
+    if len(jobs) <= 1 or max_workers <= 1:
+        results = [timed_export(filetype, filename, excel_writer, **data) for filetype, filename, data in jobs]
+    else:
+        pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+        with pool_class(max_workers=min(max_workers, len(jobs))) as pool:
+            futures = [pool.submit(timed_export, filetype, filename, excel_writer, **data)
+                       for filetype, filename, data in jobs]
+            results = [future.result() for future in futures]
+
+    # workers time their own writes, record them here where the profile lives
+    for filename, seconds in results:
+        record('export', seconds, filename)
+    return [filename for filename, _ in results]
+
+
+def get_session(pool_size=DEFAULT_MAX_WORKERS):
+    """
+    Function to create a keep-alive HTTP session shared between catalog requests
+    :param pool_size: Number of connections kept open to the catalog host
+    :return: requests Session with a pooled adapter mounted
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def fetch_pages(urls, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT, max_retries=DEFAULT_RETRIES,
+                backoff=DEFAULT_BACKOFF, cache=None, progress=None, cancel=None, limiter=None,
+                max_delay=crawler.DEFAULT_MAX_DELAY, on_page=None):
+    """
+    Function to fetch a list of pages concurrently over one pooled session
+    :param urls: List of URLs to be fetched
+    :param max_workers: Maximum number of requests in flight at once
+    :param timeout: Timeout in seconds for each request
+    :param max_retries: Number of attempts per URL before giving up
+    :param backoff: Base delay in seconds for the exponential retry backoff
+    :param cache: Optional ResponseCache shared by every request
+    :param progress: Optional callback progress('fetch', url, done, total) called as each page arrives
+    :param cancel: Optional threading.Event that stops pending fetches when set
+    :param limiter: Optional TokenBucket shared by every request
+    :param max_delay: Longest wait in seconds between attempts
+    :param on_page: Optional callback on_page(url, response) called as each page arrives
+    :return: List of responses in the same order as urls
+    """
+    max_workers = max(1, min(max_workers, len(urls)))
+
+    with get_session(pool_size=max_workers) as session:
+        def fetch(url):
+            check_cancelled(cancel)
+            logger.info(f'Retrieving courses from {url}', extra={'stage': 'fetch', 'url': url})
+            with timer('fetch', url):
+                return retry_get(url, max_retries=max_retries, session=session, timeout=timeout, backoff=backoff,
+                                 cache=cache, cancel=cancel, limiter=limiter, max_delay=max_delay)
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {executor.submit(fetch, url): url for url in urls}
+            for done, future in enumerate(as_completed(futures), start=1):
+                response = future.result()
+                if on_page is not None:
+                    on_page(futures[future], response)
+                if progress is not None:
+                    progress('fetch', futures[future], done, len(urls))
+            return [future.result() for future in futures]
+        finally:
+            # drop queued fetches if one failed or the run was cancelled
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def retry_get(url, max_retries=DEFAULT_RETRIES, session=None, timeout=DEFAULT_TIMEOUT, backoff=DEFAULT_BACKOFF,
+              cache=None, cancel=None, limiter=None, max_delay=crawler.DEFAULT_MAX_DELAY):
+    """
+    Function to send a GET request, retrying connection errors and transient statuses (429, 503, etc.)
+    with exponential backoff and jitter, or as long as the server's Retry-After asks
+    :param url: URL to be requested
+    :param max_retries: Number of attempts before giving up, at least one is always made
+    :param session: Optional requests Session to reuse pooled connections
+    :param timeout: Timeout in seconds for each attempt
+    :param backoff: Base delay in seconds, doubled after every failed attempt
+    :param cache: Optional ResponseCache to serve and revalidate pages from
+    :param cancel: Optional threading.Event that interrupts the retry backoff when set
+    :param limiter: Optional TokenBucket every attempt takes a token from
+    :param max_delay: Longest wait in seconds between attempts
+    :return: Response object with a successful status
+    """
+    getter = session.get if session is not None else requests.get
+    headers = {}
+    entry = None
+
+    if cache is not None:
+        entry = cache.get(url)
+        if entry is not None and (cache.offline or cache.is_fresh(entry[0])):
+            return http_cache.to_response(url, *entry)
+        if cache.offline:
+            raise crawler.FetchError(url, 'not cached and running offline')
+        if entry is not None:
+            headers = cache.validators(entry[0])
+
+    # 'retries' is user-editable, a value below one still gets one attempt
+    max_retries = max(1, max_retries)
+    for attempt in range(max_retries):
+        if limiter is not None and not limiter.acquire(cancel):
+            raise PipelineCancelled()
+
+        hint = None
+        try:
+            response = getter(url, timeout=timeout, headers=headers)
+        except requests.RequestException as e:
+            reason = f'{type(e).__name__}: {e}'
+        else:
+            record_bytes(url, len(response.content))
+            if response.status_code == 304 and entry is not None:
+                cache.refresh(url, entry[0])
+                return http_cache.to_response(url, *entry)
+            if response.status_code < 400:
+                if cache is not None and response.status_code == 200:
+                    cache.store(url, response)
+                return response
+
+            reason = f'HTTP {response.status_code}'
+            if response.status_code not in crawler.RETRY_STATUSES:
+                raise crawler.FetchError(url, reason)
+
+            # the server asked every client to slow down, not just this request
+            hint = crawler.retry_after(response)
+            if hint is not None and limiter is not None:
+                limiter.pause(min(hint, max_delay))
+
+        logger.warning(f'Attempt {attempt + 1} failed: {reason}',
+                       extra={'stage': 'fetch', 'url': url, 'attempt': attempt + 1})
+        record_retry(url)
+        if attempt + 1 < max_retries:
+            delay = crawler.retry_delay(attempt, backoff, hint, max_delay)
+            if cancel is None:
+                time.sleep(delay)
+            elif cancel.wait(delay):
+                raise PipelineCancelled()
+
+    raise crawler.FetchError(url, f'gave up after {max_retries} attempts, last {reason}')
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filename: course_store.py
+Author: Seth Christie
+
+Optional SQLite store of parsed catalogs and the sections offered each term. Catalog
+courses are keyed by (level, tag) and sections by (term, tag, section), both loaded
+with executemany inside one transaction and upserted so repeated runs only touch
+what changed. Queries read back the same Course shape the exporters take.
+"""
+import os
+import sqlite3
+
+import electives
+import schedule
+from instrumentation import logger, timed
+from models import Course, Section
+
+# store defaults (overridden by the 'store' section of config.yml)
+DEFAULT_STORE_PATH = 'temp/coursetool.db'
+
+# bump when the tables change, older databases are rebuilt from the next run
+SCHEMA_VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS courses (
+    level TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    number INTEGER,
+    subject_position INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT,
+    coreqs TEXT,
+    prereqs TEXT,
+    standing TEXT,
+    desc TEXT,
+    credits TEXT,
+    PRIMARY KEY (level, tag)
+);
+CREATE TABLE IF NOT EXISTS sections (
+    term TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    section TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    instructor TEXT,
+    time TEXT,
+    date TEXT,
+    building TEXT,
+    room TEXT,
+    avail INTEGER,
+    start_minute INTEGER,
+    end_minute INTEGER,
+    PRIMARY KEY (term, tag, section)
+);
+CREATE INDEX IF NOT EXISTS courses_subject_number ON courses (level, subject, number);
+CREATE INDEX IF NOT EXISTS sections_instructor ON sections (term, instructor);
+CREATE INDEX IF NOT EXISTS sections_room ON sections (term, building, room);
+CREATE INDEX IF NOT EXISTS sections_avail ON sections (term, avail);
+CREATE INDEX IF NOT EXISTS sections_start ON sections (term, start_minute);
+'''
+
+COURSE_COLUMNS = ('name', 'coreqs', 'prereqs', 'standing', 'desc', 'credits')
+SECTION_COLUMNS = ('instructor', 'time', 'date', 'building', 'room', 'avail', 'start_minute', 'end_minute')
+
+
+# ----------------------------------------------------- classes --------------------------------------------------------
+
+class CourseStore:
+    """
+    SQLite database of catalog courses and term sections with indexes on subject, number,
+    instructor, building/room, availability and start time
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            with self.connection:
+                self.connection.execute('DROP TABLE IF EXISTS courses')
+                self.connection.execute('DROP TABLE IF EXISTS sections')
+                self.connection.executescript(SCHEMA)
+                self.connection.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Function to close the database connection
+        :return: None
+        """
+        self.connection.close()
+
+    @timed('store')
+    def store_catalog(self, level, catalog):
+        """
+        Function to upsert a parsed catalog, courses no longer in the catalog are removed
+        :param level: Course level, 'Undergrad' or 'Grad'
+        :param catalog: Parsed catalog from parse_catalog, or Courses from join_sections
+        :return: Number of courses stored
+        """
+        # positions are kept per subject so a course added to one subject does not rewrite the others
+        rows = []
+        for subject_position, subject_courses in enumerate(catalog.values()):
+            for position, (tag, course) in enumerate(subject_courses.items()):
+                if not isinstance(course, dict):
+                    course = course.to_dict()
+                subject, number = course_number(tag)
+                rows.append((level, tag, subject, number, subject_position, position)
+                            + tuple(course[key] for key in COURSE_COLUMNS))
+
+        with self.connection:
+            changed = self.connection.executemany(upsert('courses', ('level', 'tag'),
+                                                         ('subject', 'number', 'subject_position', 'position')
+                                                         + COURSE_COLUMNS), rows).rowcount
+            changed += self._drop_missing('courses', 'level', level, 'tag', [row[1] for row in rows])
+        self.connection.execute('PRAGMA optimize')
+
+        logger.debug(f'Stored {len(rows)} {level} courses in {self.path}, {changed} changed', extra={'level': level})
+        return len(rows)
+
+    @timed('store')
+    def store_sections(self, term, section_index):
+        """
+        Function to upsert the sections offered in a term, sections no longer offered are removed
+        :param term: Term name 'Winter2024', 'S', etc.
+        :param section_index: Section index built by index_sections, or Courses from join_sections, None if
+            there is no CSV
+        :return: Number of sections stored
+        """
+        # a missing CSV leaves the term's stored sections as they were
+        if section_index is None:
+            logger.warning(f'No sections to store for {term}', extra={'term': term})
+            return 0
+
+        if all(isinstance(value, dict) for value in section_index.values()):
+            section_index = {tag: course.sections for subject_courses in section_index.values()
+                             for tag, course in subject_courses.items()}
+
+        rows = []
+        for tag, sections in section_index.items():
+            for position, section in enumerate(sections):
+                minutes = schedule.parse_time(section.time) or (None, None)
+                rows.append((term, tag, section.section, position, section.instructor, section.time, section.date,
+                             section.building, section.room, section.avail) + minutes)
+
+        with self.connection:
+            changed = self.connection.executemany(upsert('sections', ('term', 'tag', 'section'),
+                                                         ('position',) + SECTION_COLUMNS), rows).rowcount
+            changed += self._drop_missing('sections', 'term', term, 'tag || \'/\' || section',
+                                          [f'{row[1]}/{row[2]}' for row in rows])
+        # fresh statistics keep the planner off the low-selectivity avail index for instructor and room queries
+        self.connection.execute('PRAGMA optimize')
+
+        logger.debug(f'Stored {len(rows)} {term} sections in {self.path}, {changed} changed', extra={'term': term})
+        return len(rows)
+
+    def _drop_missing(self, table, scope_column, scope, key_expression, keys):
+        """
+        Function to delete the rows of one level or term that were not part of the latest load
+        :param table: Table name 'courses' or 'sections'
+        :param scope_column: Column the load was scoped to, 'level' or 'term'
+        :param scope: Level or term that was loaded
+        :param key_expression: SQL expression of a row's key
+        :param keys: Keys of the rows that were loaded
+        :return: Number of rows deleted
+        """
+        self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS loaded (key TEXT PRIMARY KEY)')
+        self.connection.execute('DELETE FROM loaded')
+        self.connection.executemany('INSERT OR IGNORE INTO loaded VALUES (?)', ((key,) for key in keys))
+        return self.connection.execute(f'DELETE FROM {table} WHERE {scope_column} = ? '
+                                       f'AND {key_expression} NOT IN (SELECT key FROM loaded)', (scope,)).rowcount
+
+    def find_sections(self, term, subject=None, tag=None, instructor=None, building=None, room=None,
+                      open_only=False, after=None, before=None):
+        """
+        Function to query the sections of a term, every filter is optional
+        :param term: Term name 'Winter2024', 'S', etc.
+        :param subject: Course subject 'MATH', 'MECH', etc.
+        :param tag: Course tag 'MECH-231L', 'ECON-201', etc.
+        :param instructor: Instructor name as in the Argos CSV
+        :param building: Building code 'AB', etc.
+        :param room: Room number, together with building
+        :param open_only: Only sections with available seats
+        :param after: Only sections starting at or after this clock time, '5:00pm', '17:00', etc.
+        :param before: Only sections ending at or before this clock time
+        :return: List of (course tag, Section) tuples ordered by course tag
+        """
+        clauses = ['term = ?']
+        params = [term]
+        for column, value in (('instructor', instructor), ('building', building), ('room', room), ('tag', tag)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if subject is not None:
+            clauses.append('tag LIKE ?')
+            params.append(f'{subject}-%')
+        if open_only:
+            clauses.append('avail > 0')
+        if after is not None:
+            clauses.append('start_minute >= ?')
+            params.append(clock_minutes(after))
+        if before is not None:
+            clauses.append('end_minute <= ?')
+            params.append(clock_minutes(before))
+
+        rows = self.connection.execute(f'SELECT * FROM sections WHERE {" AND ".join(clauses)} ORDER BY tag, position',
+                                       params)
+        return [(row['tag'], row_section(row)) for row in rows]
+
+    def load_courses(self, level, term=None, export_all=False, subjects=None, low=None, high=None):
+        """
+        Function to read courses with their term sections back in the shape accepted by export_courses
+        :param level: Course level, 'Undergrad' or 'Grad'
+        :param term: Term whose sections are attached, None for the catalog alone with every course kept,
+            as join_sections does without a section index
+        :param export_all: Include courses with no sections in the term
+        :param subjects: Optional collection of subjects to keep
+        :param low: Optional lowest course number kept
+        :param high: Optional course number above the highest kept
+        :return: Dictionary mapping each subject to its Courses, in catalog order
+        """
+        clauses = ['level = ?']
+        params = [level]
+        if subjects is not None:
+            clauses.append(f'subject IN ({", ".join("?" * len(subjects))})')
+            params += list(subjects)
+        if low is not None:
+            clauses.append('number >= ?')
+            params.append(low)
+        if high is not None:
+            clauses.append('number < ?')
+            params.append(high)
+
+        sections = {}
+        if term is not None:
+            for row in self.connection.execute('SELECT * FROM sections WHERE term = ? ORDER BY tag, position', (term,)):
+                sections.setdefault(row['tag'], []).append(row_section(row))
+
+        courses = {}
+        rows = self.connection.execute(f'SELECT * FROM courses WHERE {" AND ".join(clauses)} '
+                                       f'ORDER BY subject_position, position', params)
+        for row in rows:
+            # every subject is listed even when none of its courses are offered, as in join_sections
+            subject_courses = courses.setdefault(row['subject'], {})
+            if term is not None and row['tag'] not in sections and not export_all:
+                continue
+            subject_courses[row['tag']] = Course(row['tag'], *(row[key] for key in COURSE_COLUMNS),
+                                                 tuple(sections.get(row['tag'], ())))
+        return courses
+
+    def get_electives(self, level, term, rules, export_all=False):
+        """
+        Function to evaluate elective rules in the database, each rule's number range and subjects
+        are filtered by the indexes and only its exclusions are checked in Python
+        :param level: Course level, 'Undergrad' or 'Grad'
+        :param term: Term whose sections are attached
+        :param rules: List of ElectiveRules from compile_rules
+        :param export_all: Include courses with no sections in the term
+        :return: Dictionary mapping each rule name to its eligible courses, grouped by subject
+        """
+        subsets = {}
+        for rule in rules:
+            candidates = self.load_courses(level, term, export_all, subjects=rule.subjects, low=rule.low,
+                                           high=rule.high)
+            subsets[rule.name] = electives.get_electives(candidates, [rule])[rule.name]
+        return subsets
+
+
+# ---------------------------------------------------- functions -------------------------------------------------------
+
+def from_config(cfg, path=None):
+    """
+    Function to open the CourseStore from the 'store' section of config.yml
+    :param cfg: Parsed config dictionary
+    :param path: Optional database path overriding the config, which also enables the store
+    :return: CourseStore, or None if the store is disabled
+    """
+    store_cfg = cfg.get('store', {})
+    if path is None and not store_cfg.get('enabled', False):
+        return None
+
+    return CourseStore(path or store_cfg.get('path', DEFAULT_STORE_PATH))
+
+
+def upsert(table, keys, columns):
+    """
+    Function to build an upsert statement that leaves unchanged rows untouched
+    :param table: Table name 'courses' or 'sections'
+    :param keys: Primary key columns
+    :param columns: Remaining columns
+    :return: SQL statement taking one parameter per key and column, in that order
+    """
+    names = keys + columns
+    updates = ', '.join(f'{column} = excluded.{column}' for column in columns)
+    old = ', '.join(columns)
+    new = ', '.join(f'excluded.{column}' for column in columns)
+    return (f'INSERT INTO {table} ({", ".join(names)}) VALUES ({", ".join("?" * len(names))}) '
+            f'ON CONFLICT ({", ".join(keys)}) DO UPDATE SET {updates} WHERE ({old}) IS NOT ({new})')
+
+
+def course_number(tag):
+    """
+    Function to split a course tag into its subject and numeric course number
+    :param tag: Course tag 'MECH-231L', 'ECON-201', etc.
+    :return: Tuple of (subject, number or None if the number is not numeric)
+    """
+    parts = electives.split_course(tag)
+    if parts is None:
+        return tag.partition('-')[0], None
+    return parts[0], int(parts[1])
+
+
+def clock_minutes(clock):
+    """
+    Function to convert a clock time into minutes after midnight
+    :param clock: Clock time '5:00pm', '17:00', '8am', etc.
+    :return: Minutes after midnight
+    """
+    minutes, suffix = schedule.parse_clock(clock)
+    if suffix == 'pm' or (suffix is None and int(clock.strip().partition(':')[0]) >= 12):
+        minutes += 12 * 60
+    return minutes
+
+
+def row_section(row):
+    """
+    Function to build a Section from a sections row
+    :param row: sqlite3.Row of the sections table
+    :return: Section
+    """
+    return Section(row['section'], row['instructor'], row['time'], row['date'], row['building'], row['room'],
+                   row['avail'])
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filename: coursetool.py
+Author: Seth Christie
+
+Headless entry point, run with 'python -m coursetool'. The data stack is only
+imported once the arguments are parsed so the CLI never loads tkinter.
+"""
+import argparse
+import os
+import sys
+
+import batch
+import config_functions
+import crawler
+import instrumentation
+from instrumentation import logger
+
+
+# ---------------------------------------------------- functions -------------------------------------------------------
+
+def build_parser(cfg):
+    """
+    Function to build the command line argument parser
+    :param cfg: Parsed config dictionary providing the defaults
+    :return: ArgumentParser for the CLI
+    """
+    parser = argparse.ArgumentParser(prog='coursetool', description='Export Kettering course data without the GUI.')
+    jobs = parser.add_mutually_exclusive_group(required=True)
+    jobs.add_argument('--run', nargs=2, action='append', metavar=('TERM', 'CSV'),
+                      help='term and Argos CSV to export, may be repeated to share one catalog fetch')
+    jobs.add_argument('--batch', metavar='FILE',
+                      help='YAML job spec of term/level/csv/filetypes/electives entries, see data/batch.example.yml')
+    jobs.add_argument('--diff', nargs='+', metavar='SNAPSHOT',
+                      help='Argos CSV snapshots (or directories of them) in order, export the section changes '
+                           'between each consecutive pair instead of the catalog')
+    parser.add_argument('--level', default=cfg['defaults']['level'], help='course level, Undergrad or Grad')
+    parser.add_argument('--url', help=f'base Courses A-Z URL (default {cfg["defaults"]["url"]})')
+    parser.add_argument('--filetype', nargs='+', default=[cfg['defaults']['filetype']],
+                        choices=cfg['app']['filetypes'], help='export filetypes, every one is written per term')
+    parser.add_argument('--output', help='directory to write the exports into (default exports)')
+    parser.add_argument('--export-all', action='store_true', help='include courses with no sections')
+    parser.add_argument('--electives', nargs='+', default=[], choices=list(cfg['electives']),
+                        help='also export these elective lists')
+    parser.add_argument('--schedule', nargs='+', default=[], metavar='TAG',
+                        help='also export every conflict-free schedule of these courses')
+    parser.add_argument('--max-schedules', type=int, default=cfg['schedule']['limit'],
+                        help='maximum number of schedules exported per term')
+    parser.add_argument('--open-only', action='store_true', help='only schedule sections with open seats')
+    parser.add_argument('--transcript', metavar='FILE',
+                        help='YAML of completed courses and grades, also export the offered courses it makes eligible')
+    parser.add_argument('--store', metavar='DB',
+                        help='also load the catalog and sections into this SQLite database and export from it')
+    parser.add_argument('--changes', nargs='+', metavar='KIND',
+                        help='with --diff, only export these changes: added, removed, full, reopened, seats, '
+                             'instructor, time, room, section')
+    parser.add_argument('--offline', action='store_true', help='serve catalog pages from the cache only')
+    parser.add_argument('--profile', metavar='DIR',
+                        help='write a cProfile dump and a JSON summary of per-stage timings into DIR')
+    return parser
+
+
+def resolve_jobs(cfg, args):
+    """
+    Function to build the jobs to run from --run or a --batch job spec
+    :param cfg: Parsed config dictionary
+    :param args: Parsed command line arguments
+    :return: Tuple of (list of jobs, base Courses A-Z URL, output directory)
+    """
+    url, output = None, None
+    if args.batch:
+        jobs, url, output = batch.read_jobs(args.batch, cfg)
+    else:
+        jobs = batch.make_jobs([{'term': term, 'level': args.level, 'csv': csv_file, 'filetypes': args.filetype,
+                                 'electives': args.electives, 'export_all': args.export_all,
+                                 'schedule': args.schedule, 'max_schedules': args.max_schedules,
+                                 'open_only': args.open_only or cfg['schedule']['open_only'],
+                                 'transcript': args.transcript}
+                                for term, csv_file in args.run], cfg)
+
+    # command line options win over the job spec, which wins over the config
+    return jobs, args.url or url or cfg['defaults']['url'], args.output or output or 'exports'
+
+
+def export_runs(cfg, jobs, url, output, offline=False, store_path=None):
+    """
+    Function to export every job, sharing one catalog parse per level
+    :param cfg: Parsed config dictionary
+    :param jobs: List of jobs from resolve_jobs
+    :param url: Base Courses A-Z URL
+    :param output: Directory to write the exports into
+    :param offline: Serve catalog pages from the cache only
+    :param store_path: Optional SQLite database overriding the 'store' config
+    :return: List of written filenames
+    """
+    # heavy imports are deferred until there is work to do
+    import course_store
+    import http_cache
+
+    cache = http_cache.from_config(cfg)
+    if cache is not None and offline:
+        cache.offline = True
+
+    store = course_store.from_config(cfg, store_path)
+    try:
+        return batch.run_jobs(cfg, jobs, url, output, cache=cache, store=store)
+    finally:
+        if store is not None:
+            store.close()
+
+
+def export_deltas(cfg, paths, output, changes=None):
+    """
+    Function to export the section changes between consecutive Argos snapshots
+    :param cfg: Parsed config dictionary
+    :param paths: List of CSV snapshots or directories of them, in order
+    :param output: Directory to write 'snapshot_deltas.ndjson' into
+    :param changes: Optional list of change kinds to keep
+    :return: Dictionary counting the exported changes of each kind
+    """
+    # heavy imports are deferred until there is work to do
+    import snapshots
+
+    unknown = [kind for kind in changes or [] if kind not in snapshots.CHANGES]
+    if unknown:
+        raise ValueError(f'Unknown changes: {", ".join(unknown)}')
+
+    files = snapshots.snapshot_files(paths)
+    if len(files) < 2:
+        raise ValueError('--diff needs at least two snapshots')
+
+    os.makedirs(output, exist_ok=True)
+    deltas = snapshots.iter_deltas(files, tags=cfg['app']['tags'], chunksize=cfg['csv']['chunksize'],
+                                   changes=changes)
+    return snapshots.export_deltas(deltas, os.path.join(output, 'snapshot_deltas.ndjson'),
+                                   backend=cfg['export']['json_backend'])
+
+
+def main(argv=None, config_file='data/config.yml'):
+    """
+    Function to run the Course Tool from the command line
+    :param argv: List of command line arguments, defaults to sys.argv
+    :param config_file: Path of the config file
+    :return: Exit status
+    """
+    cfg = config_functions.read_config(config_file)
+    parser = build_parser(cfg)
+    args = parser.parse_args(argv)
+    instrumentation.setup_logging(cfg)
+
+    if args.diff:
+        try:
+            export_deltas(cfg, args.diff, args.output or 'exports', args.changes)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        return 0
+
+    # a bad job spec is reported before anything is fetched
+    try:
+        jobs, url, output = resolve_jobs(cfg, args)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    try:
+        if args.profile:
+            instrumentation.run_profiled(lambda: export_runs(cfg, jobs, url, output, args.offline, args.store),
+                                         args.profile)
+        else:
+            export_runs(cfg, jobs, url, output, args.offline, args.store)
+    except crawler.FetchError as e:
+        # pages fetched before the failure are checkpointed, running again only fetches the rest
+        logger.error(f'Could not fetch {e}, run again to resume', extra={'url': e.url})
+        return 1
+
+    return 0
+
+
+# ------------------------------------------------------- main ---------------------------------------------------------
+
+if __name__ == '__main__':
+    sys.exit(main())
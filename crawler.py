@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filename: crawler.py
+Author: Seth Christie
+
+Politeness and recovery for catalog crawls: a token bucket shared by every fetch
+thread, retry delays that honour Retry-After, and a checkpoint of the tag pages
+already fetched so an interrupted crawl resumes instead of starting over.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from disk_files import write_atomic
+
+# crawler defaults (overridden by the 'network' section of config.yml)
+DEFAULT_RATE = 4.0
+DEFAULT_BURST = 4
+DEFAULT_MAX_DELAY = 60.0
+DEFAULT_CHECKPOINT_DIR = 'temp/crawl'
+DEFAULT_CHECKPOINT_MAX_AGE = 86400
+
+# statuses worth another attempt, anything else at or above 400 fails immediately
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+# --------------------------------------------------- exceptions -------------------------------------------------------
+
+class FetchError(Exception):
+    """
+    Raised when a catalog page could not be fetched
+    """
+
+    def __init__(self, url, reason):
+        super().__init__(f'{url}: {reason}')
+        self.url = url
+        self.reason = reason
+
+
+# ----------------------------------------------------- classes --------------------------------------------------------
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing bursts of up to 'burst' requests and 'rate' requests
+    per second on average. A server asking to back off pauses every thread at once.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, cancel=None):
+        """
+        Function to wait for a token
+        :param cancel: Optional threading.Event that stops the wait when set
+        :return: True once a token was taken (immediately when rate is 0 and nothing paused), False if
+            cancelled while waiting
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.rate <= 0:
+                    return True
+                else:
+                    self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return True
+                    wait = (1 - self.tokens) / self.rate
+
+            # sleep outside the lock so other threads can refill and check
+            if cancel is None:
+                time.sleep(wait)
+            elif cancel.wait(wait):
+                return False
+
+    def pause(self, seconds):
+        """
+        Function to hold every request back, e.g. for a Retry-After from the server
+        :param seconds: Seconds before the next token is handed out
+        :return: None
+        """
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class CrawlCheckpoint:
+    """
+    On-disk record of the tag pages fetched so far for each catalog URL. Pages are written as
+    they arrive, together with a manifest of completed tags and their fetch times, and cleared
+    once a crawl finishes. Pages older than max_age are fetched again on resume.
+    """
+
+    def __init__(self, directory=DEFAULT_CHECKPOINT_DIR, max_age=DEFAULT_CHECKPOINT_MAX_AGE):
+        self.directory = directory
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, catalog_url, name):
+        """
+        Function to return the path of a file in a catalog's checkpoint
+        :param catalog_url: URL of the catalog being crawled
+        :param name: File name inside the checkpoint
+        :return: Path of the file
+        """
+        key = hashlib.sha256(catalog_url.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory, key, name)
+
+    def load(self, catalog_url):
+        """
+        Function to return the pages an earlier, interrupted crawl of a catalog already fetched
+        :param catalog_url: URL of the catalog being crawled
+        :return: Dictionary mapping each completed tag to the HTML of its page, pages older than max_age left out
+        """
+        pages = {}
+        now = time.time()
+        for tag, fetched in self.load_manifest(catalog_url).items():
+            if now - fetched > self.max_age:
+                continue
+            try:
+                with open(self._path(catalog_url, f'{tag}.html'), 'r', encoding='utf-8') as file:
+                    pages[tag] = file.read()
+            except FileNotFoundError:
+                continue
+        return pages
+
+    def add(self, catalog_url, tag, html_text):
+        """
+        Function to record a fetched tag page
+        :param catalog_url: URL of the catalog being crawled
+        :param tag: Course tag of the page
+        :param html_text: HTML of the page
+        :return: None
+        """
+        os.makedirs(os.path.dirname(self._path(catalog_url, 'manifest.json')), exist_ok=True)
+        write_atomic(self._path(catalog_url, f'{tag}.html'), html_text)
+
+        # the page is on disk before the manifest names it, so a crash never lists a missing page
+        with self._lock:
+            completed = self.load_manifest(catalog_url)
+            completed[tag] = time.time()
+            write_atomic(self._path(catalog_url, 'manifest.json'),
+                         json.dumps({'catalog_url': catalog_url, 'completed': completed}))
+
+    def load_manifest(self, catalog_url):
+        """
+        Function to return the tags recorded as completed for a catalog
+        :param catalog_url: URL of the catalog being crawled
+        :return: Dictionary mapping each course tag to the time its page was fetched
+        """
+        try:
+            with open(self._path(catalog_url, 'manifest.json'), 'r', encoding='utf-8') as file:
+                completed = json.load(file)['completed']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return {}
+        # manifests without fetch times are too old to trust
+        return completed if isinstance(completed, dict) else {}
+
+    def clear(self, catalog_url):
+        """
+        Function to delete the checkpoint of a finished crawl
+        :param catalog_url: URL of the catalog that was crawled
+        :return: None
+        """
+        directory = os.path.dirname(self._path(catalog_url, 'manifest.json'))
+        if not os.path.isdir(directory):
+            return
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+# ---------------------------------------------------- functions -------------------------------------------------------
+
+def from_config(cfg):
+    """
+    Function to build a CrawlCheckpoint from the 'network' section of config.yml
+    :param cfg: Parsed config dictionary
+    :return: CrawlCheckpoint, or None if checkpointing is disabled
+    """
+    network = cfg.get('network', {})
+    if not network.get('checkpoint_dir'):
+        return None
+
+    return CrawlCheckpoint(network['checkpoint_dir'], network.get('checkpoint_max_age', DEFAULT_CHECKPOINT_MAX_AGE))
+
+
+def retry_after(response):
+    """
+    Function to read the Retry-After header of a response
+    :param response: requests Response
+    :return: Seconds to wait, or None if the header is missing or unreadable
+    """
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    # HTTP dates are rare, email.utils is only imported when one arrives so the GUI starts faster
+    import email.utils
+
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def retry_delay(attempt, backoff, hint=None, max_delay=DEFAULT_MAX_DELAY):
+    """
+    Function to compute the wait before the next attempt, exponential backoff with jitter
+    unless the server asked for longer
+    :param attempt: Number of the failed attempt, starting at 0
+    :param backoff: Base delay in seconds, doubled after every failed attempt
+    :param hint: Optional seconds from a Retry-After header
+    :param max_delay: Longest wait in seconds
+    :return: Seconds to wait
+    """
+    delay = backoff * 2 ** attempt + random.uniform(0, backoff)
+    if hint is not None:
+        delay = max(delay, hint)
+    return min(delay, max_delay)
+
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filename: disk_files.py
+Author: Seth Christie
+
+On-disk helpers shared by the response cache, the parsed catalog cache and the
+crawl checkpoint: crash-safe writes and least recently used eviction.
+"""
+import os
+
+
+# ---------------------------------------------------- functions -------------------------------------------------------
+
+def write_atomic(path, data):
+    """
+    Function to write a file through a temporary file so readers never see a partial write
+    :param path: Path of the file
+    :param data: Contents of the file, str is written as UTF-8
+    :return: None
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+
+    with open(f'{path}.tmp', 'wb') as file:
+        file.write(data)
+    os.replace(f'{path}.tmp', path)
+
+
+def evict_lru(directory, suffix, max_size, companions=()):
+    """
+    Function to delete least recently used entries until a directory fits its size cap. An entry's
+    last access is the modification time of its main file, readers touch it with os.utime.
+    :param directory: Directory holding the entries
+    :param suffix: Suffix of each entry's main file, '.body', '.json', etc.
+    :param max_size: Size cap in bytes of the main files
+    :param companions: Suffixes of files stored next to each main file and deleted with it
+    :return: Number of entries deleted
+    """
+    entries = []
+    total = 0
+    for name in os.listdir(directory):
+        if not name.endswith(suffix):
+            continue
+        path = os.path.join(directory, name)
+        stat = os.stat(path)
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    # oldest access first
+    entries.sort()
+    deleted = 0
+    for _, size, path in entries:
+        if total <= max_size:
+            break
+        os.remove(path)
+        for companion in companions:
+            companion_path = path[:-len(suffix)] + companion
+            if os.path.exists(companion_path):
+                os.remove(companion_path)
+        total -= size
+        deleted += 1
+    return deleted
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filename: electives.py
+Author: Seth Christie
+"""
+
+
+# ----------------------------------------------------- classes --------------------------------------------------------
+
+class ElectiveRule:
+    """
+    Compiled elective rule from the 'electives' section of config.yml. A course is eligible
+    when its number is within [low, high), its subject is allowed, and it is not excluded by
+    subject, number or course id unless the course id is listed in allow.
+    """
+    __slots__ = ('name', 'low', 'high', 'subjects', 'exclude_subjects', 'exclude_numbers', 'exclude_courses',
+                 'allow')
+
+    def __init__(self, name, low=0, high=1000, subjects=None, exclude_subjects=(), exclude_numbers=(),
+                 exclude_courses=(), allow=()):
+        self.name = name
+        self.low = low
+        self.high = high
+        self.subjects = frozenset(subjects) if subjects else None
+        self.exclude_subjects = frozenset(exclude_subjects)
+        self.exclude_numbers = frozenset(str(number) for number in exclude_numbers)
+        self.exclude_courses = frozenset(exclude_courses)
+        self.allow = frozenset(allow)
+
+    def matches(self, subject, number, value, course_id):
+        """
+        Function to check if a course is eligible under this rule
+        :param subject: Course subject 'MATH', 'MECH', etc.
+        :param number: Course number without a lab suffix, as a string
+        :param value: Course number as an integer
+        :param course_id: Full course tag 'MECH-231L', 'ECON-201', etc.
+        :return: True if the course is an elective under this rule
+        """
+        if not (self.low <= value < self.high):
+            return False
+
+        if self.subjects is not None and subject not in self.subjects:
+            return False
+
+        excluded = (subject in self.exclude_subjects or number in self.exclude_numbers
+                    or course_id in self.exclude_courses)
+        return not excluded or course_id in self.allow
+
+
+# ---------------------------------------------------- functions -------------------------------------------------------
+
+def compile_rules(cfg_electives):
+    """
+    Function to compile the elective rules from the config
+    :param cfg_electives: 'electives' section of config.yml
+    :return: List of ElectiveRules in config order
+    """
+    rules = []
+    for name, rule in cfg_electives.items():
+        low, high = rule.get('range', [0, 1000])
+        rules.append(ElectiveRule(
+            name,
+            low=low,
+            high=high,
+            subjects=rule.get('subjects'),
+            exclude_subjects=rule.get('exclude_subjects', []),
+            exclude_numbers=rule.get('exclude_numbers', []),
+            exclude_courses=rule.get('exclude_courses', []),
+            allow=rule.get('allow', []),
+        ))
+    return rules
+
+
+def split_course(course_id):
+    """
+    Function to split a course tag into its subject and number
+    :param course_id: Course tag 'MECH-231L', 'ECON-201', etc.
+    :return: Tuple of (subject, number without a lab suffix), or None if the number is not numeric
+    """
+    subject, _, number = course_id.partition('-')
+    if len(number) > 3:
+        number = number[:-1]
+
+    if not number.isdigit():
+        return None
+    return subject, number
+
+
+def get_electives(courses, rules):
+    """
+    Function to evaluate every elective rule against the catalog in a single pass
+    :param courses: Dictionary mapping each subject to its Courses
+    :param rules: List of ElectiveRules from compile_rules
+    :return: Dictionary mapping each rule name to its eligible courses, grouped by subject
+    """
+    electives = {rule.name: {} for rule in rules}
+
+    for subject_courses in courses.values():
+        for course_id, course in subject_courses.items():
+            parts = split_course(course_id)
+            if parts is None:
+                continue
+
+            subject, number = parts
+            value = int(number)
+            for rule in rules:
+                if rule.matches(subject, number, value, course_id):
+                    electives[rule.name].setdefault(subject, {})[course_id] = course
+
+    return electives
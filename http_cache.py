@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filename: http_cache.py
+Author: Seth Christie
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from disk_files import evict_lru, write_atomic
+
+# cache defaults (overridden by the 'cache' section of config.yml)
+DEFAULT_CACHE_DIR = 'temp/cache'
+DEFAULT_TTL = 86400
+DEFAULT_MAX_SIZE_MB = 50
+
+
+# ----------------------------------------------------- classes --------------------------------------------------------
+
+class ResponseCache:
+    """
+    Persistent on-disk cache of catalog responses keyed by URL. Each entry is stored
+    as a body file plus a JSON metadata file holding the validators (ETag/Last-Modified)
+    used to revalidate the page once its TTL has expired.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, max_size_mb=DEFAULT_MAX_SIZE_MB, offline=False):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.offline = offline
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _paths(self, url):
+        """
+        Function to return the body and metadata paths for a given URL
+        :param url: URL of the cached page
+        :return: Tuple of (body path, metadata path)
+        """
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key)
+        return f'{base}.body', f'{base}.json'
+
+    def get(self, url):
+        """
+        Function to return the cached entry for a URL
+        :param url: URL of the cached page
+        :return: Tuple of (metadata dict, body bytes), or None if the URL is not cached
+        """
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+            with open(body_path, 'rb') as file:
+                body = file.read()
+            # record the access for LRU eviction, a concurrent eviction may have just removed it
+            os.utime(body_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        # a body and metadata from different stores are never served
+        if meta.get('sha256') != hashlib.sha256(body).hexdigest():
+            return None
+        return meta, body
+
+    def is_fresh(self, meta):
+        """
+        Function to check if a cached entry is still within its TTL
+        :param meta: Metadata dict of the cached entry
+        :return: True if the entry can be served without revalidation
+        """
+        return time.time() - meta['fetched'] < self.ttl
+
+    def validators(self, meta):
+        """
+        Function to build conditional request headers for a cached entry
+        :param meta: Metadata dict of the cached entry
+        :return: Dictionary of If-None-Match/If-Modified-Since headers
+        """
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def store(self, url, response):
+        """
+        Function to store a successful response in the cache
+        :param url: URL of the page
+        :param response: Response object with status 200
+        :return: None
+        """
+        body_path, meta_path = self._paths(url)
+        meta = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_type': response.headers.get('Content-Type'),
+            'encoding': response.encoding,
+            'fetched': time.time(),
+            'sha256': hashlib.sha256(response.content).hexdigest(),
+        }
+
+        with self._lock:
+            write_atomic(body_path, response.content)
+            write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+            evict_lru(self.directory, '.body', self.max_size, companions=('.json',))
+
+    def refresh(self, url, meta):
+        """
+        Function to restart the TTL of an entry after a 304 Not Modified
+        :param url: URL of the page
+        :param meta: Metadata dict of the cached entry
+        :return: None
+        """
+        _, meta_path = self._paths(url)
+        meta['fetched'] = time.time()
+
+        with self._lock:
+            write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+
+    def clear(self):
+        """
+        Function to delete every entry in the cache
+        :return: None
+        """
+        with self._lock:
+            for name in os.listdir(self.directory):
+                if name.endswith(('.body', '.json', '.tmp')):
+                    os.remove(os.path.join(self.directory, name))
+
+
+# ---------------------------------------------------- functions -------------------------------------------------------
+
+def to_response(url, meta, body):
+    """
+    Function to rebuild a Response object from a cached entry
+    :param url: URL of the cached page
+    :param meta: Metadata dict of the cached entry
+    :param body: Cached body bytes
+    :return: Response object equivalent to the original 200 response
+    """
+    # requests is only needed once a page is served, keep it off the GUI startup path
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    response = requests.Response()
+    response.url = url
+    response.status_code = 200
+    response._content = body
+    response.encoding = meta.get('encoding')
+    response.headers = CaseInsensitiveDict()
+    if meta.get('content_type'):
+        response.headers['Content-Type'] = meta['content_type']
+    if meta.get('etag'):
+        response.headers['ETag'] = meta['etag']
+    if meta.get('last_modified'):
+        response.headers['Last-Modified'] = meta['last_modified']
+    return response
+
+
+def from_config(cfg):
+    """
+    Function to build a ResponseCache from the 'cache' section of config.yml
+    :param cfg: Parsed config dictionary
+    :return: ResponseCache, or None if caching is disabled
+    """
+    cache_cfg = cfg.get('cache', {})
+    if not cache_cfg.get('enabled', False):
+        return None
+
+    return ResponseCache(
+        directory=cache_cfg.get('dir', DEFAULT_CACHE_DIR),
+        ttl=cache_cfg.get('ttl', DEFAULT_TTL),
+        max_size_mb=cache_cfg.get('max_size_mb', DEFAULT_MAX_SIZE_MB),
+        offline=cache_cfg.get('offline', False),
+    )
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filename: instrumentation.py
+Author: Seth Christie
+"""
+import cProfile
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# logger shared by every CourseTool module
+logger = logging.getLogger('coursetool')
+
+# logging defaults (overridden by the 'logging' section of config.yml)
+DEFAULT_LEVEL = 'INFO'
+DEFAULT_FORMAT = 'text'
+
+# attributes present on every LogRecord, anything else was passed through extra=
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+# profile collecting stage timings for the current run, None when profiling is off
+_profile = None
+
+
+# ----------------------------------------------------- classes --------------------------------------------------------
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats each log record as a single JSON line, including any fields passed with extra=
+    """
+
+    def format(self, record):
+        entry = {
+            'time': round(record.created, 3),
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES})
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class PipelineProfile:
+    """
+    Thread-safe collector of the time spent in each pipeline stage, broken down per key
+    (tag, URL or export filename), together with the bytes fetched and retries per URL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.keys = {}
+        self.bytes_fetched = {}
+        self.retries = {}
+
+    def record(self, stage, seconds, key=None):
+        """
+        Function to add the time of one stage call
+        :param stage: Stage name 'fetch', 'parse', 'export', etc.
+        :param seconds: Seconds spent in the call
+        :param key: Optional tag, URL or filename the call worked on
+        :return: None
+        """
+        with self._lock:
+            totals = self.stages.setdefault(stage, {'calls': 0, 'seconds': 0.0})
+            totals['calls'] += 1
+            totals['seconds'] += seconds
+
+            if key is not None:
+                per_key = self.keys.setdefault(key, {})
+                per_key[stage] = per_key.get(stage, 0.0) + seconds
+
+    def add_bytes(self, key, size):
+        """
+        Function to add the size of a fetched page
+        :param key: URL of the page
+        :param size: Number of bytes received
+        :return: None
+        """
+        with self._lock:
+            self.bytes_fetched[key] = self.bytes_fetched.get(key, 0) + size
+
+    def add_retry(self, key):
+        """
+        Function to count a failed request attempt
+        :param key: URL of the page
+        :return: None
+        """
+        with self._lock:
+            self.retries[key] = self.retries.get(key, 0) + 1
+
+    def summary(self):
+        """
+        Function to summarise the collected timings
+        :return: Dictionary of wall time, per-stage totals, per-key timings, bytes fetched and retries
+        """
+        with self._lock:
+            return {
+                'wall_seconds': round(time.perf_counter() - self.started, 6),
+                'stages': {stage: {'calls': totals['calls'], 'seconds': round(totals['seconds'], 6)}
+                           for stage, totals in self.stages.items()},
+                'keys': {key: {stage: round(seconds, 6) for stage, seconds in stages.items()}
+                         for key, stages in self.keys.items()},
+                'bytes_fetched': dict(self.bytes_fetched),
+                'total_bytes_fetched': sum(self.bytes_fetched.values()),
+                'retries': dict(self.retries),
+                'total_retries': sum(self.retries.values()),
+            }
+
+
+# ---------------------------------------------------- functions -------------------------------------------------------
+
+def setup_logging(cfg=None):
+    """
+    Function to configure the CourseTool logger from the 'logging' section of config.yml
+    :param cfg: Parsed config dictionary, defaults are used if None
+    :return: CourseTool logger
+    """
+    log_cfg = (cfg or {}).get('logging', {})
+
+    handler = logging.StreamHandler(sys.stdout)
+    if log_cfg.get('format', DEFAULT_FORMAT) == 'json':
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('[CourseTool] %(message)s'))
+
+    logger.handlers = [handler]
+    logger.setLevel(log_cfg.get('level', DEFAULT_LEVEL))
+    logger.propagate = False
+    return logger
+
+
+def start_profile():
+    """
+    Function to start collecting stage timings for a run
+    :return: PipelineProfile collecting the timings
+    """
+    global _profile
+    _profile = PipelineProfile()
+    return _profile
+
+
+def stop_profile():
+    """
+    Function to stop collecting stage timings
+    :return: PipelineProfile that was collecting, or None if profiling was off
+    """
+    global _profile
+    profile, _profile = _profile, None
+    return profile
+
+
+@contextmanager
+def timer(stage, key=None):
+    """
+    Context manager timing a pipeline stage, recorded in the active profile and logged at DEBUG
+    :param stage: Stage name 'fetch', 'parse', 'export', etc.
+    :param key: Optional tag, URL or filename the stage works on
+    :return: None
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start, key)
+
+
+def timed(stage):
+    """
+    Decorator timing every call of a function as a pipeline stage
+    :param stage: Stage name recorded for each call
+    :return: Decorator
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # skip the bookkeeping entirely for hot helpers when nobody is listening
+            if _profile is None and not logger.isEnabledFor(logging.DEBUG):
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def record(stage, seconds, key=None):
+    """
+    Function to record the time of a stage measured elsewhere, e.g. in a worker process
+    :param stage: Stage name 'fetch', 'parse', 'export', etc.
+    :param seconds: Seconds spent in the stage
+    :param key: Optional tag, URL or filename the stage worked on
+    :return: None
+    """
+    profile = _profile
+    if profile is not None:
+        profile.record(stage, seconds, key)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        target = f' {key}' if key is not None else ''
+        logger.debug(f'{stage}{target} took {seconds:.4f}s',
+                     extra={'stage': stage, 'key': key, 'seconds': round(seconds, 6)})
+
+
+def record_bytes(key, size):
+    """
+    Function to record the size of a page fetched from the network
+    :param key: URL of the page
+    :param size: Number of bytes received
+    :return: None
+    """
+    profile = _profile
+    if profile is not None:
+        profile.add_bytes(key, size)
+
+
+def record_retry(key):
+    """
+    Function to record a failed request attempt
+    :param key: URL of the page
+    :return: None
+    """
+    profile = _profile
+    if profile is not None:
+        profile.add_retry(key)
+
+
+def run_profiled(func, directory, name='coursetool'):
+    """
+    Function to run a callable under cProfile while collecting stage timings, then write a
+    pstats dump and a JSON summary of the timings
+    :param func: Callable to be profiled
+    :param directory: Directory to write '<name>.pstats' and '<name>.json' into
+    :param name: Base name of the written files
+    :return: Return value of func
+    """
+    os.makedirs(directory, exist_ok=True)
+    profiler = cProfile.Profile()
+    start_profile()
+
+    try:
+        return profiler.runcall(func)
+    finally:
+        profile = stop_profile()
+        profiler.dump_stats(os.path.join(directory, f'{name}.pstats'))
+
+        with open(os.path.join(directory, f'{name}.json'), 'w', encoding='utf-8') as file:
+            json.dump(profile.summary(), file, indent=2)
+        logger.info(f'Wrote {name}.pstats and {name}.json to {directory}')
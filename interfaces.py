@@ -4,12 +4,35 @@
 Filename: interfaces.py
 Author: Seth Christie
 """
+import importlib
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog
 
-import course_functions
+import config_functions
 import main
+from instrumentation import logger
+
+# modules needed by the pipeline but not to draw the window, loaded by warm_imports
+DATA_MODULES = ['course_functions']
+
+
+# ---------------------------------------------------- functions -------------------------------------------------------
+
+def warm_imports():
+    """
+    Function to import the data stack (pandas, styleframe, bs4, requests) in the background
+    so the first run does not pay for it, called on a daemon thread once the window is up
+    :return: None
+    """
+    for module in DATA_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            # the run reports the failure, the form stays usable
+            logger.warning(f'Could not preload {module}: {e}')
 
 
 # ----------------------------------------------------- classes --------------------------------------------------------
@@ -30,6 +53,14 @@ class MainFrame(ttk.Frame):
         self.CHECK_EXPORT_ME = tk.BooleanVar(value=False)
         self.CHECK_EXPORT_ADV = tk.BooleanVar(value=False)
         self.CHECK_EXPORT_CS = tk.BooleanVar(value=False)
+        self.STR_STATUS = tk.StringVar(value='')
+        self.INT_PROGRESS = tk.IntVar(value=0)
+
+        # background pipeline state
+        self.data = None
+        self.worker = None
+        self.cancel_event = threading.Event()
+        self.messages = queue.Queue()
 
         options = {'padx': 10, 'pady': 5}
         options_cb = {'padx': 10, 'pady': 5, 'column': 0, 'sticky': 'w', 'columnspan': 2}
@@ -107,6 +138,15 @@ class MainFrame(ttk.Frame):
                                          style='Large.TButton', state='normal')
         self.run_button.grid(row=13, column=0, **options, columnspan=3, sticky='s')
 
+        # add progress bar and cancel button
+        self.progress_bar = ttk.Progressbar(self, mode='determinate', length=420, variable=self.INT_PROGRESS)
+        self.cancel_button = main.AppButton(self, text='Cancel', command=self.cancel, width=90, height=30,
+                                            style='Normal.TButton', state='disabled')
+        self.status_label = ttk.Label(self, textvariable=self.STR_STATUS, style='Normal.TLabel')
+        self.progress_bar.grid(row=14, column=0, **options, columnspan=2, sticky='we')
+        self.cancel_button.grid(row=14, column=2, **options)
+        self.status_label.grid(row=15, column=0, **options, columnspan=3, sticky='w')
+
     def show_frame(self):
         """
         Function to display the current frame
@@ -132,52 +172,152 @@ class MainFrame(ttk.Frame):
 
     def run(self):
         """
-        Run the Course Tool
+        Run the Course Tool in a background thread
         :return: None
         """
-        tags = self.parent.TAGS
-        catalog_url = self.STR_URL.get() + 'undergrad/'
-        term = self.STR_TERM.get().replace(' ', '')
-
-        # select correct filetype
-        match self.STR_FILETYPE.get():
-            case 'Excel':
-                filetype = 'xlsx'
-            case 'YAML':
-                filetype = 'yml'
-            case 'JSON':
-                filetype = 'json'
-            case _:
-                filetype = 'xlsx'
+        # block re-entrant runs
+        if self.worker is not None and self.worker.is_alive():
+            return
+
+        # read every tkinter variable on the main thread before handing off to the worker
+        options = {
+            'term': self.STR_TERM.get().replace(' ', ''),
+            'level': self.STR_LEVEL.get(),
+            'catalog_url': config_functions.get_catalog_url(self.STR_URL.get(), self.STR_LEVEL.get()),
+            'csv_file': self.STR_FILE.get(),
+            'export_all': self.CHECK_EXPORT_ALL.get(),
+            'export_me': self.CHECK_EXPORT_ME.get(),
+            'export_adv': self.CHECK_EXPORT_ADV.get(),
+            'export_cs': self.CHECK_EXPORT_CS.get(),
+        }
+        options['electives'] = [name for name, checked in (('MECH', options['export_me']),
+                                                            ('ADV', options['export_adv']),
+                                                            ('CS', options['export_cs'])) if checked]
+
+        options['filetype'] = config_functions.get_extension(self.STR_FILETYPE.get())
 
         # print selected options
-        print(f'[CourseTool] Term: {term}')
-        print(f'[CourseTool] Level: {self.STR_LEVEL.get()}')
-        print(f'[CourseTool] URL: {catalog_url}')
-        print(f'[CourseTool] CSV File: {self.STR_FILE.get()}')
-        print(f'[CourseTool] Export Filetype: {filetype}')
-        print(f'[CourseTool] Export All? {self.CHECK_EXPORT_ALL.get()}')
-        print(f'[CourseTool] Export MECH Electives? {self.CHECK_EXPORT_ME.get()}')
-        print(f'[CourseTool] Export Adv. Electives? {self.CHECK_EXPORT_ADV.get()}')
-        print(f'[CourseTool] Export CS Electives? {self.CHECK_EXPORT_CS.get()}')
-
-        # retrieve course data
-        data = course_functions.get_course_data(self.STR_FILE.get(), tags, catalog_url, self.CHECK_EXPORT_ALL.get())
-        export_filename = f'{term}_{self.STR_LEVEL.get()}.{filetype}'
-
-        # export course data
-        course_functions.export_courses(data, filetype, f'exports/{export_filename}')
-
-        # other options
-        if self.CHECK_EXPORT_ME.get():
-            mech_dict = course_functions.get_mech_electives(self, data)
-            course_functions.export_courses(mech_dict, filetype, f'exports/{term}_MECH.{filetype}')
-
-        if self.CHECK_EXPORT_ADV.get():
-            adv_dict = course_functions.get_adv_electives(self, data)
-            course_functions.export_courses(adv_dict, filetype, f'exports/{term}_ADV.{filetype}')
-
-        if self.CHECK_EXPORT_CS.get():
-            pass  # TODO export cs electives
-
-        return data
\ No newline at end of file
+        logger.info(f'Term: {options["term"]}')
+        logger.info(f'Level: {options["level"]}')
+        logger.info(f'URL: {options["catalog_url"]}')
+        logger.info(f'CSV File: {options["csv_file"]}')
+        logger.info(f'Export Filetype: {options["filetype"]}')
+        logger.info(f'Export All? {options["export_all"]}')
+        logger.info(f'Export MECH Electives? {options["export_me"]}')
+        logger.info(f'Export Adv. Electives? {options["export_adv"]}')
+        logger.info(f'Export CS Electives? {options["export_cs"]}')
+
+        # fetch + parse steps for every tag, plus the export step
+        self.progress_bar.configure(maximum=2 * len(self.parent.TAGS) + 1)
+        self.INT_PROGRESS.set(0)
+        self.STR_STATUS.set('Starting...')
+        self.run_button.disable()
+        self.cancel_button.enable()
+
+        self.cancel_event.clear()
+        self.worker = threading.Thread(target=self.pipeline, args=(options,), daemon=True)
+        self.worker.start()
+        self.after(100, self.poll)
+
+    def cancel(self):
+        """
+        Function to request cancellation of the running pipeline
+        :return: None
+        """
+        if self.worker is not None and self.worker.is_alive():
+            self.cancel_event.set()
+            self.cancel_button.disable()
+            self.STR_STATUS.set('Cancelling...')
+
+    def report(self, stage, name, done, total):
+        """
+        Function to forward pipeline progress to the main thread
+        :param stage: Pipeline stage, 'fetch' or 'parse'
+        :param name: URL or tag that was just completed
+        :param done: Number of completed items in this stage
+        :param total: Total number of items in this stage
+        :return: None
+        """
+        self.messages.put(('progress', f'{stage.capitalize()} {name} ({done}/{total})'))
+
+    def pipeline(self, options):
+        """
+        Function to fetch, parse and export the course data, run on the worker thread
+        :param options: Dictionary of options read from the interface
+        :return: None
+        """
+        # the data stack is loaded here rather than at startup, a no-op once warm_imports has run
+        try:
+            import course_functions
+        except ImportError as e:
+            self.messages.put(('error', e))
+            return
+
+        try:
+            # retrieve course data
+            data = course_functions.get_course_data(options['csv_file'], self.parent.TAGS, options['catalog_url'],
+                                                    options['export_all'],
+                                                    max_workers=self.parent.NET_MAX_WORKERS,
+                                                    timeout=self.parent.NET_TIMEOUT,
+                                                    max_retries=self.parent.NET_RETRIES,
+                                                    backoff=self.parent.NET_BACKOFF,
+                                                    rate=self.parent.NET_RATE,
+                                                    burst=self.parent.NET_BURST,
+                                                    max_delay=self.parent.NET_MAX_DELAY,
+                                                    checkpoint=self.parent.CHECKPOINT,
+                                                    cache=self.parent.CACHE,
+                                                    parser=self.parent.APP_PARSER,
+                                                    progress=self.report,
+                                                    cancel=self.cancel_event,
+                                                    parsed_cache=self.parent.PARSED_CACHE,
+                                                    chunksize=self.parent.CSV_CHUNKSIZE,
+                                                    parse_workers=self.parent.PARSE_WORKERS)
+
+            term = options['term']
+            filetype = options['filetype']
+            export_filename = f'{term}_{options["level"]}.{filetype}'
+
+            # export course data and every selected elective list in one fan-out
+            course_functions.check_cancelled(self.cancel_event)
+            self.messages.put(('progress', f'Exporting {export_filename}'))
+            targets = [(None, filetype, f'exports/{export_filename}')]
+            targets += [(name, filetype, f'exports/{term}_{name}.{filetype}') for name in options['electives']]
+            course_functions.export_targets(data, targets, rules=self.parent.ELECTIVE_RULES,
+                                            **self.parent.EXPORT_OPTIONS)
+
+            self.messages.put(('done', data))
+        except course_functions.PipelineCancelled:
+            self.messages.put(('cancelled', None))
+        except Exception as e:
+            self.messages.put(('error', e))
+
+    def poll(self):
+        """
+        Function to apply queued pipeline messages to the interface, rescheduled with after()
+        :return: None
+        """
+        try:
+            while True:
+                kind, payload = self.messages.get_nowait()
+                match kind:
+                    case 'progress':
+                        self.INT_PROGRESS.set(self.INT_PROGRESS.get() + 1)
+                        self.STR_STATUS.set(payload)
+                    case 'done':
+                        self.data = payload
+                        self.INT_PROGRESS.set(self.progress_bar['maximum'])
+                        self.STR_STATUS.set('Done.')
+                    case 'cancelled':
+                        self.STR_STATUS.set('Cancelled.')
+                        logger.info('Run cancelled.')
+                    case 'error':
+                        self.STR_STATUS.set(f'Error: {payload}')
+                        logger.error(f'Run failed: {payload}')
+        except queue.Empty:
+            pass
+
+        if self.worker.is_alive() or not self.messages.empty():
+            self.after(100, self.poll)
+        else:
+            self.run_button.enable()
+            self.cancel_button.disable()
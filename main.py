@@ -4,17 +4,23 @@
 Filename: main.py
 Author: Seth Christie
 """
+import threading
 import tkinter as tk
 from tkinter import ttk
 from ctypes import windll
-import yaml
 import sv_ttk
 
+from config_functions import export_options, read_config
+import crawler
+import electives
+import http_cache
+import instrumentation
 import interfaces
+import parse_cache
 
 # App constants
 APP_WIDTH = 850
-APP_HEIGHT = 800
+APP_HEIGHT = 880
 
 
 # ---------------------------------------------------- functions -------------------------------------------------------
@@ -27,17 +33,6 @@ def close_window():
     app.destroy()
 
 
-def read_config(filename):
-    """
-    Function to read the config file and output parameters
-    :param filename: Name of the config file
-    :return: List of config parameters
-    """
-    with open(filename, 'r') as file:
-        cfg = yaml.safe_load(file)
-    return cfg
-
-
 # ----------------------------------------------------- classes --------------------------------------------------------
 
 class Application(tk.Tk):
@@ -46,11 +41,13 @@ class Application(tk.Tk):
 
         # read config.yml into vars
         self.config = read_config('data/config.yml')
+        instrumentation.setup_logging(self.config)
 
         self.APP_TITLE = self.config['app']['title']
         self.APP_VERSION = self.config['app']['version']
         self.APP_LANG = self.config['app']['lang']
         self.APP_FONT = self.config['app']['font']
+        self.APP_PARSER = self.config['app']['parser']
         self.DEFAULT_TERM = self.config['defaults']['term']
         self.DEFAULT_LEVEL = self.config['defaults']['level']
         self.DEFAULT_URL = self.config['defaults']['url']
@@ -58,9 +55,21 @@ class Application(tk.Tk):
         self.FILETYPES = self.config['app']['filetypes']
         self.TAGS = self.config['app']['tags']
 
-        self.MISC_CFILTER = self.config['misc']['cfilter']
-        self.MISC_CAFILTER = self.config['misc']['cafilter']
-        self.MISC_ADVFILTER = self.config['misc']['advfilter']
+        self.NET_MAX_WORKERS = self.config['network']['max_workers']
+        self.NET_TIMEOUT = self.config['network']['timeout']
+        self.NET_RETRIES = self.config['network']['retries']
+        self.NET_BACKOFF = self.config['network']['backoff']
+        self.NET_RATE = self.config['network']['rate']
+        self.NET_BURST = self.config['network']['burst']
+        self.NET_MAX_DELAY = self.config['network']['max_delay']
+        self.CSV_CHUNKSIZE = self.config['csv']['chunksize']
+        self.PARSE_WORKERS = self.config['parse']['workers']
+        self.CACHE = http_cache.from_config(self.config)
+        self.PARSED_CACHE = parse_cache.from_config(self.config)
+        self.CHECKPOINT = crawler.from_config(self.config)
+
+        self.ELECTIVE_RULES = electives.compile_rules(self.config['electives'])
+        self.EXPORT_OPTIONS = export_options(self.config)
 
         # set theme to dark theme
         sv_ttk.set_theme('dark')
@@ -96,6 +105,10 @@ class Application(tk.Tk):
         self.attributes('-alpha', 1.0)
         self.lift()
 
+        # load the data stack once the window is drawn instead of before it
+        if self.config['app'].get('preload', True):
+            self.after_idle(lambda: threading.Thread(target=interfaces.warm_imports, daemon=True).start())
+
 
 class AppButton(ttk.Frame):
     def __init__(self, parent, height=None, width=None, text="", command=None, style=None, state='disabled'):
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filename: models.py
+Author: Seth Christie
+"""
+
+
+# ----------------------------------------------------- classes --------------------------------------------------------
+
+class Section:
+    """
+    A single offered section of a course, joined from the Argos class schedule
+    """
+    __slots__ = ('section', 'instructor', 'time', 'date', 'building', 'room', 'avail')
+
+    def __init__(self, section, instructor, time, date, building, room, avail):
+        self.section = section
+        self.instructor = instructor
+        self.time = time
+        self.date = date
+        self.building = building
+        self.room = room
+        self.avail = avail
+
+    def __eq__(self, other):
+        return isinstance(other, Section) and all(getattr(self, key) == getattr(other, key)
+                                                  for key in self.__slots__)
+
+    def __repr__(self):
+        return f'Section({self.section!r}, {self.instructor!r}, {self.time!r}, {self.date!r})'
+
+    def to_dict(self):
+        """
+        Function to convert the section into the exported sectionblock shape
+        :return: Dictionary containing the section, without its section number
+        """
+        return {
+            'instructor': self.instructor,
+            'time': self.time,
+            'date': self.date,
+            'building': self.building,
+            'room': self.room,
+            'avail': self.avail
+        }
+
+    @classmethod
+    def from_dict(cls, section, sectionblock):
+        """
+        Function to build a Section from an exported sectionblock
+        :param section: Section number
+        :param sectionblock: Dictionary containing the section
+        :return: Section
+        """
+        return cls(section, sectionblock['instructor'], sectionblock['time'], sectionblock['date'],
+                   sectionblock['building'], sectionblock['room'], sectionblock['avail'])
+
+
+class Course:
+    """
+    A catalog course together with the sections offered for it in a term
+    """
+    __slots__ = ('tag', 'name', 'coreqs', 'prereqs', 'standing', 'desc', 'credits', 'sections')
+
+    def __init__(self, tag, name, coreqs, prereqs, standing, desc, credits, sections=()):
+        self.tag = tag
+        self.name = name
+        self.coreqs = coreqs
+        self.prereqs = prereqs
+        self.standing = standing
+        self.desc = desc
+        self.credits = credits
+        self.sections = sections
+
+    def __eq__(self, other):
+        return isinstance(other, Course) and all(getattr(self, key) == getattr(other, key)
+                                                 for key in self.__slots__)
+
+    def __repr__(self):
+        return f'Course({self.tag!r}, {self.name!r}, sections={len(self.sections)})'
+
+    def to_dict(self):
+        """
+        Function to convert the course into the exported course shape
+        :return: Dictionary containing the course with its sections keyed by section number
+        """
+        return {
+            'tag': self.tag,
+            'name': self.name,
+            'coreqs': self.coreqs,
+            'prereqs': self.prereqs,
+            'standing': self.standing,
+            'desc': self.desc,
+            'credits': self.credits,
+            'sections': {section.section: section.to_dict() for section in self.sections},
+        }
+
+    @classmethod
+    def from_dict(cls, course, sections=None):
+        """
+        Function to build a Course from an exported or parsed course dictionary
+        :param course: Dictionary containing the course
+        :param sections: Tuple of Sections, read from course['sections'] if None
+        :return: Course
+        """
+        if sections is None:
+            sections = tuple(Section.from_dict(section, sectionblock)
+                             for section, sectionblock in course.get('sections', {}).items())
+
+        return cls(course['tag'], course['name'], course['coreqs'], course['prereqs'], course['standing'],
+                   course['desc'], course['credits'], sections)
+
+
+# ---------------------------------------------------- functions -------------------------------------------------------
+
+def to_course_dict(courses):
+    """
+    Function to convert a catalog of Courses into the nested dictionary used by the exporters
+    :param courses: Dictionary mapping each subject to a dictionary of Courses
+    :return: Dictionary mapping each subject to a dictionary of course dictionaries
+    """
+    return {subject: {tag: course.to_dict() for tag, course in subject_courses.items()}
+            for subject, subject_courses in courses.items()}
+
+
+def from_course_dict(course_list):
+    """
+    Function to convert a nested course dictionary into a catalog of Courses
+    :param course_list: Dictionary mapping each subject to a dictionary of course dictionaries
+    :return: Dictionary mapping each subject to a dictionary of Courses
+    """
+    return {subject: {tag: Course.from_dict(course) for tag, course in subject_courses.items()}
+            for subject, subject_courses in course_list.items()}
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filename: parse_cache.py
+Author: Seth Christie
+"""
+import hashlib
+import json
+import os
+import threading
+
+from disk_files import evict_lru, write_atomic
+
+# parse cache defaults (overridden by the 'cache' section of config.yml)
+DEFAULT_PARSED_DIR = 'temp/parsed'
+DEFAULT_MAX_SIZE_MB = 20
+
+# bump when parse_courseblock output changes so stale entries are ignored
+PARSE_VERSION = 1
+
+
+# ----------------------------------------------------- classes --------------------------------------------------------
+
+class ParsedCatalogCache:
+    """
+    Content-addressed store of parsed catalog pages. Each entry holds the course dictionaries
+    parsed from one page and is keyed by a hash of the page HTML, so a tag is only re-parsed
+    when its catalog page actually changed. Entries of pages that changed since are evicted
+    least recently used first once the cache outgrows its size cap.
+    """
+
+    def __init__(self, directory=DEFAULT_PARSED_DIR, max_size_mb=DEFAULT_MAX_SIZE_MB):
+        self.directory = directory
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def page_hash(html_text, parser):
+        """
+        Function to hash a catalog page together with the parser that reads it
+        :param html_text: HTML of the catalog page
+        :param parser: Parser engine name
+        :return: Hex digest identifying the parsed result
+        """
+        digest = hashlib.sha256(f'{PARSE_VERSION}:{parser}:'.encode('utf-8'))
+        digest.update(html_text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        """
+        Function to return the path of a cache entry
+        :param key: Page hash from page_hash
+        :return: Path of the JSON entry
+        """
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key):
+        """
+        Function to return the parsed courses for a page hash
+        :param key: Page hash from page_hash
+        :return: Dictionary of courses, or None if the page has not been parsed before
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                courses = json.load(file)
+            # record the access for LRU eviction
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return courses
+
+    def store(self, key, courses):
+        """
+        Function to store the parsed courses of a page
+        :param key: Page hash from page_hash
+        :param courses: Dictionary of courses parsed from the page
+        :return: None
+        """
+        path = self._path(key)
+        with self._lock:
+            write_atomic(path, json.dumps(courses, ensure_ascii=False))
+            evict_lru(self.directory, '.json', self.max_size)
+
+    def clear(self):
+        """
+        Function to delete every entry in the cache
+        :return: None
+        """
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                os.remove(os.path.join(self.directory, name))
+
+
+# ---------------------------------------------------- functions -------------------------------------------------------
+
+def from_config(cfg):
+    """
+    Function to build a ParsedCatalogCache from the 'cache' section of config.yml
+    :param cfg: Parsed config dictionary
+    :return: ParsedCatalogCache, or None if caching is disabled
+    """
+    cache_cfg = cfg.get('cache', {})
+    if not cache_cfg.get('enabled', False):
+        return None
+
+    return ParsedCatalogCache(directory=cache_cfg.get('parsed_dir', DEFAULT_PARSED_DIR),
+                              max_size_mb=cache_cfg.get('parsed_max_size_mb', DEFAULT_MAX_SIZE_MB))
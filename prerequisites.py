@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filename: prerequisites.py
+Author: Seth Christie
+
+Prerequisite graph of a catalog. The free-text prereqs/coreqs of every course are
+parsed once into AND/OR trees, compiled to lists of clauses (any clause satisfied
+satisfies the course) and stored as a boolean clause x requirement matrix, so a
+transcript is checked against every course in one numpy pass.
+"""
+import itertools
+import re
+
+import numpy as np
+import yaml
+
+# grade points used to compare a transcript grade against a minimum grade
+GRADE_POINTS = {
+    'A': 4.0, 'A-': 3.7, 'B+': 3.3, 'B': 3.0, 'B-': 2.7, 'C+': 2.3, 'C': 2.0, 'C-': 1.7,
+    'D+': 1.3, 'D': 1.0, 'D-': 0.7, 'F': 0.0,
+}
+PASSING_GRADE = 'D-'
+
+# pass/fail grades that pass a course without a letter, they meet no minimum grade
+PASS_GRADES = frozenset({'P', 'S', 'CR'})
+
+TOKEN = re.compile(r'\(\s*Minimum grade:\s*(?P<grade>[A-F][+-]?)\s*\)'
+                   r'|(?P<course>\b[A-Z]{2,4}-\d{3}[A-Z]?\b)'
+                   r'|\b(?P<op>(?i:and|or))\b'
+                   r'|(?P<paren>[()])')
+
+
+# ----------------------------------------------------- classes --------------------------------------------------------
+
+class PrerequisiteGraph:
+    """
+    Compiled prerequisite DAG of a catalog with a reverse index of the courses each course unlocks
+    """
+
+    def __init__(self, catalog):
+        self.prereqs = {}
+        self.coreqs = {}
+        for subject_courses in catalog.values():
+            for tag, course in subject_courses.items():
+                self.prereqs[tag] = parse_requirement(field(course, 'prereqs'))
+                self.coreqs[tag] = parse_requirement(field(course, 'coreqs'))
+
+        # course -> courses listing it as a prerequisite
+        self.unlocked_by = {}
+        for tag, requirement in self.prereqs.items():
+            for required in requirement_courses(requirement):
+                self.unlocked_by.setdefault(required, set()).add(tag)
+
+        self.tags = list(self.prereqs)
+        self.prereq_clauses = ClauseMatrix([self.prereqs[tag] for tag in self.tags])
+        self.coreq_clauses = ClauseMatrix([self.coreqs[tag] for tag in self.tags])
+
+    def requires(self, tag):
+        """
+        Function to return the courses named in a course's prerequisites
+        :param tag: Course tag 'MECH-231L', 'ECON-201', etc.
+        :return: Sorted list of course tags
+        """
+        return sorted(requirement_courses(self.prereqs.get(tag)))
+
+    def unlocks(self, tag):
+        """
+        Function to return the courses that list a course as a prerequisite
+        :param tag: Course tag 'MECH-231L', 'ECON-201', etc.
+        :return: Sorted list of course tags
+        """
+        return sorted(self.unlocked_by.get(tag, ()))
+
+    def all_prerequisites(self, tag):
+        """
+        Function to return every course a course depends on, directly or through other prerequisites
+        :param tag: Course tag 'MECH-231L', 'ECON-201', etc.
+        :return: Sorted list of course tags
+        """
+        seen = set()
+        pending = [tag]
+        while pending:
+            for required in requirement_courses(self.prereqs.get(pending.pop())):
+                if required not in seen:
+                    seen.add(required)
+                    pending.append(required)
+        return sorted(seen)
+
+    def eligible(self, transcript, concurrent=(), offered=None):
+        """
+        Function to find every course a student can take next
+        :param transcript: Dictionary mapping completed course tags to grades ('B+', 'C', None if unknown),
+            or a list of completed course tags
+        :param concurrent: Course tags taken in the same term, which satisfy corequisites
+        :param offered: Optional collection of course tags to choose from, defaults to the whole catalog
+        :return: Sorted list of course tags whose prerequisites and corequisites are met, excluding passed ones.
+            An offered corequisite whose own prerequisites are met counts, since both can be taken together.
+        """
+        if not isinstance(transcript, dict):
+            transcript = dict.fromkeys(transcript)
+
+        offered = set(self.tags) if offered is None else set(offered)
+        prereqs_met = self.prereq_clauses.evaluate(
+            lambda tag, grade: tag in transcript and meets_grade(transcript[tag], grade))
+        takeable = {tag for tag, ok in zip(self.tags, prereqs_met) if ok and tag in offered}
+        taking = set(transcript) | set(concurrent) | takeable
+        coreqs_met = self.coreq_clauses.evaluate(lambda tag, grade: tag in taking)
+
+        passed = {tag for tag, grade in transcript.items() if meets_grade(grade, None)}
+        return sorted(tag for tag, ok in zip(self.tags, prereqs_met & coreqs_met)
+                      if ok and tag in offered and tag not in passed)
+
+
+class ClauseMatrix:
+    """
+    Requirements of many courses compiled into one boolean matrix of clauses x (course, minimum grade)
+    requirements. A clause is met when every requirement in its row is met, a course when any of
+    its clauses is met. Courses without requirements get a single empty clause.
+    """
+
+    def __init__(self, requirements):
+        clauses_per_course = [to_clauses(requirement) for requirement in requirements]
+
+        self.leaves = sorted({leaf for clauses in clauses_per_course for clause in clauses for leaf in clause},
+                             key=lambda leaf: (leaf[0], leaf[1] or ''))
+        column = {leaf: index for index, leaf in enumerate(self.leaves)}
+
+        rows = [clause for clauses in clauses_per_course for clause in clauses]
+        self.matrix = np.zeros((len(rows), len(self.leaves)), dtype=bool)
+        for row, clause in enumerate(rows):
+            self.matrix[row, [column[leaf] for leaf in clause]] = True
+
+        # first clause row of every course, for reducing clauses back to courses
+        self.starts = np.cumsum([0] + [len(clauses) for clauses in clauses_per_course[:-1]])
+        self.empty = len(clauses_per_course) == 0
+
+    def evaluate(self, is_met):
+        """
+        Function to evaluate every course at once
+        :param is_met: Callable is_met(course tag, minimum grade or None) telling if one requirement is met
+        :return: Boolean array with one entry per course, in construction order
+        """
+        if self.empty:
+            return np.zeros(0, dtype=bool)
+
+        met = np.fromiter((is_met(tag, grade) for tag, grade in self.leaves), dtype=bool, count=len(self.leaves))
+        clause_met = ~(self.matrix & ~met).any(axis=1)
+        return np.logical_or.reduceat(clause_met, self.starts)
+
+
+# ---------------------------------------------------- functions -------------------------------------------------------
+
+def field(course, name):
+    """
+    Function to read a field from a course dictionary or a Course
+    :param course: Course dictionary from parse_catalog, or a Course from join_sections
+    :param name: Field name 'prereqs' or 'coreqs'
+    :return: Field value
+    """
+    return course[name] if isinstance(course, dict) else getattr(course, name)
+
+
+def parse_requirement(text):
+    """
+    Function to parse a prerequisite or corequisite string into an AND/OR tree. Text that is not a
+    course, a minimum grade, 'and', 'or' or a parenthesis is ignored.
+    :param text: Requirement text '(MATH-204 or MATH-204H) and EE-210', 'BIOL-100 (Minimum grade: C)', etc.
+    :return: ('course', tag, minimum grade or None), ('and', children) or ('or', children), or None if no
+        course is required
+    """
+    # missing values come back as NaN from Excel exports
+    if not isinstance(text, str) or text == 'None':
+        return None
+
+    tokens = []
+    for match in TOKEN.finditer(text):
+        kind = match.lastgroup
+        value = match.group(kind)
+        tokens.append((kind, value.lower() if kind == 'op' else value))
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else (None, None)
+
+    def parse_any():
+        nonlocal position
+        children = [parse_all()]
+        while peek() == ('op', 'or'):
+            position += 1
+            children.append(parse_all())
+        return combine('or', children)
+
+    def parse_all():
+        nonlocal position
+        children = [parse_one()]
+        while peek() == ('op', 'and'):
+            position += 1
+            children.append(parse_one())
+        return combine('and', children)
+
+    def parse_one():
+        nonlocal position
+        kind, value = peek()
+        if kind == 'paren' and value == '(':
+            position += 1
+            node = parse_any()
+            if peek() == ('paren', ')'):
+                position += 1
+            return node
+        if kind == 'course':
+            position += 1
+            grade = None
+            if peek()[0] == 'grade':
+                grade = peek()[1]
+                position += 1
+            return 'course', value, grade
+        # a stray operator, grade or parenthesis, skip it
+        if kind is not None and value != ')':
+            position += 1
+        return None
+
+    # parsing stops early at a stray closing parenthesis, anything after it is still required
+    requirement = None
+    while position < len(tokens):
+        start = position
+        requirement = combine('and', [requirement, parse_any()])
+        if position == start:
+            position += 1
+    return requirement
+
+
+def combine(operator, children):
+    """
+    Function to join requirement trees, dropping empty ones and flattening nested operators
+    :param operator: 'and' or 'or'
+    :param children: List of requirement trees or None
+    :return: Requirement tree, or None if every child is None
+    """
+    flat = []
+    for child in children:
+        if child is None:
+            continue
+        flat.extend(child[1] if child[0] == operator else [child])
+
+    if not flat:
+        return None
+    return flat[0] if len(flat) == 1 else (operator, flat)
+
+
+def requirement_courses(requirement):
+    """
+    Function to list every course named in a requirement tree
+    :param requirement: Requirement tree from parse_requirement
+    :return: Set of course tags
+    """
+    if requirement is None:
+        return set()
+    if requirement[0] == 'course':
+        return {requirement[1]}
+    return set().union(*(requirement_courses(child) for child in requirement[1]))
+
+
+def to_clauses(requirement):
+    """
+    Function to expand a requirement tree into alternative clauses of (course, minimum grade) requirements
+    :param requirement: Requirement tree from parse_requirement
+    :return: List of frozensets, the requirement is met when every entry of any one clause is met
+    """
+    if requirement is None:
+        return [frozenset()]
+    if requirement[0] == 'course':
+        return [frozenset([(requirement[1], requirement[2])])]
+
+    expanded = [to_clauses(child) for child in requirement[1]]
+    if requirement[0] == 'or':
+        clauses = [clause for child in expanded for clause in child]
+    else:
+        clauses = [frozenset().union(*combo) for combo in itertools.product(*expanded)]
+    return list(dict.fromkeys(clauses))
+
+
+def read_transcript(filename):
+    """
+    Function to read a transcript file, a YAML mapping of course tags to grades or a YAML list of tags
+    :param filename: Path of the transcript
+    :return: Dictionary mapping completed course tags to upper case grades, None where no grade is given
+    """
+    with open(filename, 'r') as file:
+        transcript = yaml.safe_load(file) or {}
+
+    if isinstance(transcript, list):
+        return dict.fromkeys(str(tag) for tag in transcript)
+    return {str(tag): (str(grade).strip().upper() or None) if grade is not None else None
+            for tag, grade in transcript.items()}
+
+
+def filter_courses(courses, tags):
+    """
+    Function to keep only some courses of a catalog, in the shape accepted by export_courses
+    :param courses: Dictionary mapping each subject to its Courses
+    :param tags: Collection of course tags to keep
+    :return: Dictionary mapping each subject to its kept Courses, subjects with none left are dropped
+    """
+    tags = set(tags)
+    kept = {subject: {tag: course for tag, course in subject_courses.items() if tag in tags}
+            for subject, subject_courses in courses.items()}
+    return {subject: subject_courses for subject, subject_courses in kept.items() if subject_courses}
+
+
+def meets_grade(grade, minimum):
+    """
+    Function to check a transcript grade against a minimum grade
+    :param grade: Transcript grade 'B+', 'C', 'P', etc., None if the course was completed with an unknown grade
+    :param minimum: Minimum grade, None for any passing grade
+    :return: True if the grade satisfies the minimum, False for 'W', 'I', 'NC' and any other unknown grade
+    """
+    if grade is None:
+        return True
+    if grade in PASS_GRADES:
+        return minimum is None
+    if grade not in GRADE_POINTS:
+        return False
+    return GRADE_POINTS[grade] >= GRADE_POINTS[minimum or PASSING_GRADE]
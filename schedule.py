@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filename: schedule.py
+Author: Seth Christie
+
+Conflict-free schedule search. Each section's meeting times are turned into a
+bitmask over the week, one bit per 5 minute slot, so two sections clash exactly
+when their masks share a bit.
+"""
+import functools
+import itertools
+import math
+from instrumentation import timer
+from models import Course
+
+# weekday letters used by the Argos day columns, 'R' is Thursday
+DAYS = 'MTWRFSU'
+
+# minutes per bit and bits per day in a week mask
+SLOT_MINUTES = 5
+DAY_SLOTS = 24 * 60 // SLOT_MINUTES
+
+
+# ---------------------------------------------------- functions -------------------------------------------------------
+
+def parse_clock(clock):
+    """
+    Function to split a clock time into minutes after midnight and its am/pm suffix
+    :param clock: Clock time '6:00', '8:00pm', '12:20pm', etc.
+    :return: Tuple of (minutes, 'am', 'pm' or None)
+    """
+    clock = clock.strip().lower()
+    suffix = clock[-2:] if clock[-2:] in ('am', 'pm') else None
+    hours, _, minutes = (clock[:-2] if suffix else clock).partition(':')
+    return (int(hours) % 12) * 60 + int(minutes or 0), suffix
+
+
+@functools.lru_cache(maxsize=None)
+def parse_time(time):
+    """
+    Function to parse an Argos time range into minutes after midnight
+    :param time: Time range '6:00-8:00pm', '10:15-11:45am', '11:20-12:20pm', etc.
+    :return: Tuple of (start, end) minutes, or None for 'TBA' and anything unreadable
+    """
+    if not time or '-' not in time:
+        return None
+
+    try:
+        start, start_suffix = parse_clock(time.split('-')[0])
+        end, end_suffix = parse_clock(time.split('-')[1])
+    except ValueError:
+        return None
+
+    if end_suffix == 'pm':
+        end += 12 * 60
+
+    # only the end carries am/pm, the start is the latest reading that still comes before it
+    if start_suffix == 'pm':
+        start += 12 * 60
+    elif start_suffix is None and start + 12 * 60 < end:
+        start += 12 * 60
+
+    return (start, end) if start < end else None
+
+
+@functools.lru_cache(maxsize=None)
+def time_mask(time, date):
+    """
+    Function to build the week bitmask of a meeting time
+    :param time: Time range '6:00-8:00pm', etc.
+    :param date: Meeting days joined as in get_sections, 'M, W, F', 'T, R', etc.
+    :return: Integer with one bit set per occupied 5 minute slot, 0 if the section has no fixed time
+    """
+    minutes = parse_time(time)
+    if minutes is None or not date:
+        return 0
+
+    first = minutes[0] // SLOT_MINUTES
+    last = -(-minutes[1] // SLOT_MINUTES)
+    day_mask = ((1 << (last - first)) - 1) << first
+
+    mask = 0
+    for day in date.replace(',', ' ').split():
+        if day in DAYS:
+            mask |= day_mask << (DAYS.index(day) * DAY_SLOTS)
+    return mask
+
+
+def section_mask(section):
+    """
+    Function to return the week bitmask of a Section
+    :param section: Section from get_sections
+    :return: Integer bitmask, 0 if the section has no fixed time
+    """
+    return time_mask(section.time, section.date)
+
+
+def meeting_masks(df):
+    """
+    Function to build the week bitmask of every section that meets in more than one Argos row. index_sections
+    keeps one row per section, so these masks OR together the meetings of all its rows.
+    :param df: Dataframe containing sections, from load_sections
+    :return: Dictionary mapping ('SUBJ-NUMB', SEC) to its bitmask
+    """
+    if df is None:
+        return {}
+
+    # most sections meet once, only the repeated ones need joining
+    repeated = df[df.duplicated(['SUBJ', 'NUMB', 'SEC'], keep=False)]
+    columns = [repeated[column].astype(object).tolist()
+               for column in ['SUBJ', 'NUMB', 'SEC', 'TIME', 'M', 'T', 'W', 'TH', 'F']]
+
+    masks = {}
+    for subject, number, section, time, *days in zip(*columns):
+        date = ' '.join(day for day in days if isinstance(day, str) and day.strip())
+        key = (f'{subject}-{number}', section)
+        masks[key] = masks.get(key, 0) | time_mask(time if isinstance(time, str) else None, date)
+    return masks
+
+
+def find_course(courses, tag):
+    """
+    Function to look up a course by its tag
+    :param courses: Dictionary mapping each subject to its Courses
+    :param tag: Course tag 'MECH-231L', 'ECON-201', etc.
+    :return: Course, or None if it is not offered
+    """
+    return courses.get(tag.partition('-')[0], {}).get(tag)
+
+
+def section_groups(courses, wanted, open_only=False, masks=None):
+    """
+    Function to group the sections of each wanted course by their week bitmask, sections meeting at
+    the same times are interchangeable so the search only branches once per distinct meeting time
+    :param courses: Dictionary mapping each subject to its Courses, from join_sections
+    :param wanted: List of course tags to schedule together
+    :param open_only: Skip sections with no available seats
+    :param masks: Optional bitmasks of sections meeting in more than one row, from meeting_masks
+    :return: List of (Course, list of (mask, Sections)) in wanted order, or None if a course has no sections left
+    """
+    groups = []
+    for tag in dict.fromkeys(wanted):
+        course = find_course(courses, tag)
+        if course is None:
+            raise KeyError(f'{tag} is not offered')
+
+        by_mask = {}
+        for section in course.sections:
+            if open_only and not (isinstance(section.avail, int) and section.avail > 0):
+                continue
+            mask = masks.get((course.tag, section.section)) if masks else None
+            by_mask.setdefault(section_mask(section) if mask is None else mask, []).append(section)
+
+        # a course with nothing to choose makes every schedule impossible
+        if not by_mask:
+            return None
+        groups.append((course, list(by_mask.items())))
+    return groups
+
+
+def iter_choices(groups):
+    """
+    Function to walk every conflict-free choice of one meeting time per course, placing the course
+    with the fewest distinct times first and dropping a branch as soon as it clashes
+    :param groups: Section groups from section_groups
+    :return: Generator of lists of (Course, Sections) in wanted order
+    """
+    order = sorted(range(len(groups)), key=lambda index: len(groups[index][1]))
+    chosen = [None] * len(groups)
+
+    def search(depth, used):
+        if depth == len(order):
+            yield list(chosen)
+            return
+
+        course, options = groups[order[depth]]
+        for mask, sections in options:
+            if not mask & used:
+                chosen[order[depth]] = (course, sections)
+                yield from search(depth + 1, used | mask)
+
+    return search(0, 0)
+
+
+def find_schedules(courses, wanted, open_only=False, limit=None, masks=None):
+    """
+    Function to enumerate every conflict-free choice of one section per wanted course
+    :param courses: Dictionary mapping each subject to its Courses, from join_sections
+    :param wanted: List of course tags to schedule together
+    :param open_only: Skip sections with no available seats
+    :param limit: Optional maximum number of schedules returned
+    :param masks: Optional bitmasks of sections meeting in more than one row, from meeting_masks
+    :return: List of schedules, each a tuple of (Course, Section) pairs in wanted order
+    """
+    groups = section_groups(courses, wanted, open_only, masks)
+    if groups is None:
+        return []
+
+    # every section in a chosen group fits, so each choice expands to a plain product
+    schedules = itertools.chain.from_iterable(
+        itertools.product(*[[(course, section) for section in sections] for course, sections in choice])
+        for choice in iter_choices(groups))
+    return list(itertools.islice(schedules, limit))
+
+
+def count_schedules(courses, wanted, open_only=False, masks=None):
+    """
+    Function to count the conflict-free schedules without building them
+    :param courses: Dictionary mapping each subject to its Courses, from join_sections
+    :param wanted: List of course tags to schedule together
+    :param open_only: Skip sections with no available seats
+    :param masks: Optional bitmasks of sections meeting in more than one row, from meeting_masks
+    :return: Number of schedules find_schedules would return without a limit
+    """
+    groups = section_groups(courses, wanted, open_only, masks)
+    if groups is None:
+        return 0
+
+    return sum(math.prod(len(sections) for _, sections in choice) for choice in iter_choices(groups))
+
+
+def schedule_courses(schedule):
+    """
+    Function to convert a schedule into the catalog shape accepted by export_courses
+    :param schedule: Tuple of (Course, Section) pairs from find_schedules
+    :return: Dictionary mapping each subject to its Courses, each with only the chosen section
+    """
+    courses = {}
+    for course, section in schedule:
+        subject = course.tag.partition('-')[0]
+        courses.setdefault(subject, {})[course.tag] = Course(course.tag, course.name, course.coreqs, course.prereqs,
+                                                             course.standing, course.desc, course.credits, (section,))
+    return courses
+
+
+def export_schedules(schedules, filetype, filename, **options):
+    """
+    Function to export every schedule into a single file. Excel, Arrow and Parquet rows start with a
+    'Schedule' column, JSON and YAML group the courses under 'Schedule <n>' and each course carries
+    its schedule number, so NDJSON lines keep it too.
+    :param schedules: List of schedules from find_schedules
+    :param filetype: File extension 'xlsx', 'json', etc.
+    :param filename: Name and location of the export
+    :param options: Keyword arguments passed on to write_export (excel_writer, json_backend, yaml_backend)
+    :return: Name of the written export
+    """
+    import course_functions
+
+    with timer('export', filename):
+        if filetype in ('xlsx', 'arrow', 'parquet'):
+            flatten, headers = course_functions.course_rows, course_functions.excel_headers
+            if filetype != 'xlsx':
+                flatten, headers = course_functions.course_records, course_functions.columnar_headers
+            rows = [[number] + row for number, courses in enumerate(map(schedule_courses, schedules), start=1)
+                    for subject in courses.values() for course in subject.values() for row in flatten(course)]
+            return course_functions.write_export(filetype, filename, rows=rows, headers=['Schedule'] + headers,
+                                                 **options)
+
+        course_dict = {f'Schedule {number}': {course.tag: {'schedule': number, **course.to_dict()}
+                                              for subject in courses.values() for course in subject.values()}
+                       for number, courses in enumerate(map(schedule_courses, schedules), start=1)}
+        return course_functions.write_export(filetype, filename, course_dict=course_dict, **options)
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filename: snapshots.py
+Author: Seth Christie
+
+Seat availability deltas between Argos snapshots. Each snapshot is reduced to one
+row per CRN and hashed, so consecutive snapshots are compared by hash and only the
+sections whose hash changed are inspected field by field. Snapshots are read one
+at a time, only the previous one is kept while the next is compared.
+"""
+import json
+import os
+
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+import course_functions
+from instrumentation import logger, timed
+
+# fields compared between snapshots, one row per CRN
+TRACKED = ['tag', 'section', 'instructor', 'time', 'room', 'avail', 'enrl']
+
+# every kind of change a delta can report
+CHANGES = ['added', 'removed', 'full', 'reopened', 'seats', 'instructor', 'time', 'room', 'section']
+
+# Argos day columns in week order, 'TH' holds 'R'
+DAY_COLUMNS = ['M', 'T', 'W', 'TH', 'F']
+
+
+# ---------------------------------------------------- functions -------------------------------------------------------
+
+def snapshot_files(paths):
+    """
+    Function to expand snapshot arguments into CSV files, directories are replaced by their CSVs in name order
+    :param paths: List of CSV files or directories of CSV files
+    :return: List of CSV files in snapshot order
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.csv'))
+        else:
+            files.append(path)
+    return files
+
+
+@timed('snapshot')
+def read_snapshot(csv_file, tags=None, chunksize=None):
+    """
+    Function to read an Argos snapshot as one row per CRN. Sections meeting more than once have
+    their meetings sorted by time and room before they are joined, so reordered rows hash the same.
+    :param csv_file: Argos CSV snapshot
+    :param tags: Optional list of subjects to keep
+    :param chunksize: Optional number of rows read at a time
+    :return: Dataframe indexed by CRN with the TRACKED columns and a 'hash' column, or None if the file was not found
+    """
+    # snapshots are only compared, so every column stays plain text instead of the categoricals of load_sections
+    dtypes = {**course_functions.SECTION_DTYPES, **course_functions.OPTIONAL_SECTION_DTYPES}
+    columns = set(dtypes) | set(course_functions.SECTION_NUMERIC) | set(course_functions.OPTIONAL_SECTION_NUMERIC)
+    try:
+        reader = pd.read_csv(csv_file, usecols=lambda column: column in columns, keep_default_na=False,
+                             dtype=dict.fromkeys(dtypes, str), chunksize=chunksize)
+    except FileNotFoundError as e:
+        logger.error(f'Snapshot was not found: {e}', extra={'stage': 'snapshot', 'csv_file': csv_file})
+        return None
+
+    frames = []
+    for chunk in (reader if chunksize else [reader]):
+        if tags is not None:
+            chunk = chunk[chunk['SUBJ'].isin(tags)]
+        frames.append(chunk)
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    days = df[DAY_COLUMNS[0]].str.cat([df[column] for column in DAY_COLUMNS[1:]]).str.replace(' ', '', regex=False)
+    meetings = pd.DataFrame({
+        'CRN': df['CRN'],
+        'tag': df['SUBJ'] + '-' + df['NUMB'],
+        'section': df['SEC'],
+        'instructor': df['INSTRUCTOR'].str.strip(),
+        'time': (days + ' ' + df['TIME']).str.strip(),
+        'room': (df['BLDG'] + ' ' + df['ROOM']).str.strip(),
+        'avail': pd.to_numeric(df['AVAIL'], errors='coerce').astype('Int64'),
+        'enrl': pd.to_numeric(df['ENRL'], errors='coerce').astype('Int64'),
+    })
+
+    # most CRNs meet once, only the repeated ones need joining
+    repeated = meetings['CRN'].duplicated(keep=False)
+    single = meetings[~repeated].set_index('CRN')
+    if repeated.any():
+        ordered = meetings[repeated].sort_values(['CRN', 'time', 'room', 'instructor'], kind='stable')
+        grouped = ordered.groupby('CRN', sort=False).agg(
+            tag=('tag', 'first'), section=('section', 'first'), instructor=('instructor', join_unique),
+            time=('time', '; '.join), room=('room', '; '.join), avail=('avail', 'first'), enrl=('enrl', 'first'))
+        single = pd.concat([single, grouped])
+
+    single['hash'] = pd.util.hash_pandas_object(single[TRACKED], index=False)
+    return single
+
+
+def join_unique(values):
+    """
+    Function to join the distinct values of a column in order
+    :param values: Series of strings
+    :return: Values joined with '; '
+    """
+    return '; '.join(dict.fromkeys(values))
+
+
+def plain(value):
+    """
+    Function to convert a dataframe value into a plain Python value for export
+    :param value: Value read from a snapshot
+    :return: int, str or None
+    """
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def classify(before, after):
+    """
+    Function to name the changes between two versions of a section
+    :param before: Dictionary of TRACKED fields in the earlier snapshot
+    :param after: Dictionary of TRACKED fields in the later snapshot
+    :return: List of change kinds from CHANGES, in CHANGES order
+    """
+    changes = set()
+    old, new = before['avail'], after['avail']
+    if old != new or before['enrl'] != after['enrl']:
+        if old is not None and new is not None and old > 0 >= new:
+            changes.add('full')
+        elif old is not None and new is not None and old <= 0 < new:
+            changes.add('reopened')
+        else:
+            changes.add('seats')
+    for field in ('instructor', 'time', 'room'):
+        if before[field] != after[field]:
+            changes.add(field)
+    if before['tag'] != after['tag'] or before['section'] != after['section']:
+        changes.add('section')
+    return [change for change in CHANGES if change in changes]
+
+
+def diff_snapshots(previous, current, label, changes=None):
+    """
+    Function to compare two snapshots by row hash and describe every section that changed
+    :param previous: Earlier snapshot from read_snapshot
+    :param current: Later snapshot from read_snapshot
+    :param label: Name of the later snapshot, stored in each delta
+    :param changes: Optional collection of change kinds to keep, defaults to all of CHANGES
+    :return: Generator of delta dictionaries with snapshot, crn, tag, section, changes, before and after
+    """
+    common = previous.index.intersection(current.index)
+    differs = previous.loc[common, 'hash'].to_numpy() != current.loc[common, 'hash'].to_numpy()
+
+    def records(frame, crns):
+        rows = frame.loc[crns, TRACKED].astype(object)
+        return {crn: {field: plain(value) for field, value in zip(TRACKED, row)}
+                for crn, row in zip(rows.index, rows.itertuples(index=False))}
+
+    added = records(current, current.index.difference(previous.index, sort=False))
+    removed = records(previous, previous.index.difference(current.index, sort=False))
+    old = records(previous, common[differs])
+    new = records(current, common[differs])
+
+    for crn, after in added.items():
+        if changes is None or 'added' in changes:
+            yield {'snapshot': label, 'crn': crn, 'tag': after['tag'], 'section': after['section'],
+                   'changes': ['added'], 'after': after}
+
+    for crn, after in new.items():
+        before = old[crn]
+        kinds = classify(before, after)
+        if changes is not None:
+            kinds = [kind for kind in kinds if kind in changes]
+        if not kinds:
+            continue
+
+        fields = [field for field in TRACKED if before[field] != after[field]]
+        yield {'snapshot': label, 'crn': crn, 'tag': after['tag'], 'section': after['section'], 'changes': kinds,
+               'before': {field: before[field] for field in fields}, 'after': {field: after[field] for field in fields}}
+
+    for crn, before in removed.items():
+        if changes is None or 'removed' in changes:
+            yield {'snapshot': label, 'crn': crn, 'tag': before['tag'], 'section': before['section'],
+                   'changes': ['removed'], 'before': before}
+
+
+def iter_deltas(files, tags=None, chunksize=None, changes=None):
+    """
+    Function to stream the deltas between every pair of consecutive snapshots, holding at most two in memory
+    :param files: List of Argos CSV snapshots in order
+    :param tags: Optional list of subjects to keep
+    :param chunksize: Optional number of rows read at a time
+    :param changes: Optional collection of change kinds to keep
+    :return: Generator of delta dictionaries
+    """
+    previous = None
+    for csv_file in files:
+        current = read_snapshot(csv_file, tags=tags, chunksize=chunksize)
+        if current is None:
+            continue
+
+        if previous is not None:
+            yield from diff_snapshots(previous, current, os.path.splitext(os.path.basename(csv_file))[0], changes)
+        previous = current
+
+
+def export_deltas(deltas, filename, backend=course_functions.DEFAULT_JSON_BACKEND):
+    """
+    Function to write deltas as NDJSON while they are produced, one delta per line
+    :param deltas: Iterable of delta dictionaries from iter_deltas
+    :param filename: Name and location of the export
+    :param backend: 'orjson', 'json', or 'auto' to use orjson when it is installed
+    :return: Dictionary counting the deltas of each change kind
+    """
+    counts = dict.fromkeys(CHANGES, 0)
+    use_orjson = backend != 'json' and orjson is not None
+
+    with open(filename, 'wb') as file:
+        for delta in deltas:
+            if use_orjson:
+                file.write(orjson.dumps(delta, option=orjson.OPT_APPEND_NEWLINE))
+            else:
+                file.write((json.dumps(delta, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8'))
+            for kind in delta['changes']:
+                counts[kind] += 1
+
+    summary = ', '.join(f'{count} {kind}' for kind, count in counts.items() if count)
+    logger.info(f'Wrote {summary or "no changes"} to {filename}', extra={'path': filename})
+    return counts